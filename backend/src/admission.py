@@ -0,0 +1,55 @@
+# braile/backend/src/admission.py
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    """Raised when a limiter is full; the API turns it into a 503 with Retry-After."""
+
+    def __init__(self, stage, retry_after):
+        super().__init__(f"Server busy ({stage}), retry in {retry_after}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class WorkLimiter:
+    """
+    A bounded thread pool plus an admission counter. Requests beyond `max_pending`
+    in-flight calls are rejected right away instead of piling up in an unbounded queue.
+    """
+
+    def __init__(self, name, max_workers, max_pending, retry_after=1):
+        self.name = name
+        self.max_pending = max(max_pending, max_workers)
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self.pending = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.pending >= self.max_pending:
+            raise Overloaded(self.name, self.retry_after)
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    async def call(self, fn, *args, **kwargs):
+        """Runs a blocking call on this limiter's pool (admission already granted)."""
+        loop = asyncio.get_running_loop()
+        # Carry context variables (e.g. per-request stage timings) into the worker thread
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+    async def run(self, fn, *args, **kwargs):
+        """Admits one request and runs a blocking call on this limiter's pool."""
+        async with self.admit():
+            return await self.call(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,83 +1,253 @@
-from transformers import pipeline
-import torch
 import warnings
-import asyncio
-from googletrans import Translator
+import os
+import re
+import threading
+import time
+
+from cache import ResultCache, make_key, normalize_text
+from refiner_backends import REFINER_BACKEND, build_pipeline
+from translation_backends import build_translation_backend, lang_code
+from metrics import REFINE_BATCH_SIZE, TRANSLATE_BATCH_SIZE
+from deadline import estimate_tokens
 
 # Suppress unnecessary warnings
 warnings.filterwarnings("ignore")
 
+MODEL_NAME = "google/flan-t5-base"
+GENERATION_KWARGS = {"max_length": 128, "num_beams": 4, "early_stopping": True}
+# Generation settings per strategy; the API falls back to greedy search when beam search can't meet the budget
+GENERATION_STRATEGIES = {"beam": GENERATION_KWARGS, "greedy": {"max_length": 128, "num_beams": 1}}
+CACHE_DB_PATH = os.environ.get("BRAILLE_CACHE_DB", "data/cache.sqlite3")
+WARMUP_TEXT = "helo wrld"
+# Longest text one prompt gets; longer lines are cut at sentence ends, else between words.
+# Outputs stop at max_length (128) tokens, which ~200 characters of text stay well under.
+REFINE_SEGMENT_CHARS = int(os.environ.get("BRAILLE_REFINE_SEGMENT_CHARS", 200))
+# Segments per generate call; pending segments are sorted by length first, so each call pads little
+REFINE_BUCKET_SIZE = int(os.environ.get("BRAILLE_REFINE_BUCKET_SIZE", 16))
+SENTENCE_END_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def split_line(line, max_chars=REFINE_SEGMENT_CHARS):
+    """Cuts one decoded line into segments of at most `max_chars`, preferring sentence ends."""
+    if len(line) <= max_chars:
+        return [line]
+    pieces = []
+    for sentence in SENTENCE_END_RE.split(line.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for word in sentence.split():
+            pieces.extend(word[k:k + max_chars] for k in range(0, len(word), max_chars))
+    segments = []
+    for piece in pieces:
+        if segments and len(segments[-1]) + 1 + len(piece) <= max_chars:
+            segments[-1] += " " + piece
+        else:
+            segments.append(piece)
+    return segments
+
+
 class AIRefiner:
-    def __init__(self): 
-        # Detect if GPU is available
-        self.device = 0 if torch.cuda.is_available() else -1
-        print(f"[*] Initializing AI Refiner on {'GPU' if self.device == 0 else 'CPU'}...")
-        
+    def __init__(self, cache_path=CACHE_DB_PATH, backend=REFINER_BACKEND): 
+        # 0. Refinement/translation caches shared across requests and restarts
+        self.refine_cache = ResultCache(cache_path, "refine_cache")
+        self.translate_cache = ResultCache(cache_path, "translate_cache")
+
+        # torch/transformers/translation backends are imported and the model loaded by load(),
+        # so constructing the refiner is cheap and callers decide when to pay for it.
+        self.device = -1
+        self.backend = backend
+        self.model = None
+        self.translator_engine = None
+        self.ready = threading.Event()
+        self.load_times = {}
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Imports the ML stack, loads Flan-T5 and the translation backend, then runs a warm-up generate."""
+        with self._load_lock:
+            if not self.ready.is_set():
+                self._load()
+
+    def _load(self):
+        t_start = time.perf_counter()
+
         # 1. Initialize the AI Model (Flan-T5)
         try:
-            self.model = pipeline(
-                "text2text-generation", 
-                model="google/flan-t5-base", 
-                device=self.device
-            )
-            print("[+] AI Model loaded successfully.")
+            t0 = time.perf_counter()
+            import torch
+            import transformers  # noqa: F401 (timed here, used by build_pipeline)
+            self.load_times["import_ml"] = time.perf_counter() - t0
+
+            # Detect if GPU is available
+            self.device = 0 if torch.cuda.is_available() else -1
+            print(f"[*] Initializing AI Refiner on {'GPU' if self.device == 0 else 'CPU'}...")
+
+            t0 = time.perf_counter()
+            self.model, self.backend = build_pipeline(MODEL_NAME, self.device, self.backend)
+            self.load_times["load_model"] = time.perf_counter() - t0
+            print(f"[+] AI Model loaded successfully ({self.backend} backend).")
         except Exception as e:
             print(f"[-] AI Model loading failed: {e}")
             self.model = None
 
-        # 2. Initialize the Translator independently
+        # 2. Initialize the Translator independently (local models load per language pair on first use)
         try:
-            self.translator_engine = Translator()
-            print("[+] Googletrans engine initialized.")
+            t0 = time.perf_counter()
+            self.translator_engine = build_translation_backend(self.device)
+            self.load_times["load_translator"] = time.perf_counter() - t0
+            if self.translator_engine:
+                print(f"[+] Translation backend initialized ({self.translator_engine.name}).")
         except Exception as e:
             print(f"[-] Translator initialization failed: {e}")
             self.translator_engine = None
 
-    def fix_text(self, text):
+        # 3. Warm-up: the first generate pays for lazy kernel/graph setup
+        if self.model:
+            try:
+                t0 = time.perf_counter()
+                self.model(f"Correct spelling and grammar: {WARMUP_TEXT}", **GENERATION_KWARGS)
+                self.load_times["warmup"] = time.perf_counter() - t0
+            except Exception as e:
+                print(f"[-] AI Model warm-up failed: {e}")
+
+        self.load_times["total"] = time.perf_counter() - t_start
+        timings = ", ".join(f"{k}={v:.2f}s" for k, v in self.load_times.items())
+        print(f"[+] AI Refiner ready ({timings})")
+        self.ready.set()
+
+    def status(self):
+        return {
+            "ready": self.ready.is_set(),
+            "model_loaded": self.model is not None,
+            "translator_loaded": self.translator_engine is not None,
+            "translation_backend": getattr(self.translator_engine, "name", None),
+            "device": "GPU" if self.device == 0 else "CPU",
+            "backend": self.backend,
+            "load_times": {k: round(v, 3) for k, v in self.load_times.items()},
+        }
+
+    def model_key(self):
+        """What turns raw text into the refined/translated output (part of whole-result cache keys)."""
+        return [MODEL_NAME, self.backend, getattr(self.translator_engine, "name", None)]
+
+    def fix_text(self, text, strategy="beam"):
         """Clean English Braille-to-Text artifacts using Flan-T5."""
-        if not text or len(text.strip()) < 2:
-            return text
+        return self.fix_batch([text], strategy)[0]
+
+    def fix_batch(self, texts, strategy="beam"):
+        """Refines several raw texts; see refine_batch(). Keeps input order."""
+        return [text for text, _ in self.refine_batch(texts, strategy)]
+
+    def refine_batch(self, texts, strategy="beam"):
+        """Refines several raw texts; see refine_batch_usage(). Returns (text, refined) pairs."""
+        return [(text, ok) for text, ok, _ in self.refine_batch_usage(texts, strategy)]
+
+    def refine_batch_usage(self, texts, strategy="beam"):
+        """
+        Refines several raw texts with batched Flan-T5 calls. Keeps input order and line breaks:
+        every line is cut into model-sized segments, the segments of all texts are refined in
+        length buckets, and each text is put back together from its refined segments.
+        `strategy` names the GENERATION_STRATEGIES entry; greedy also takes cached beam results.
+        Returns (text, refined, tokens) triples; refined is False where the model was missing
+        or failed and (part of) the raw text came back in its place, tokens counts the input
+        tokens the text sent to the model (cached and repeated segments send none).
+        """
+        results = [(t, not t or len(t.strip()) < 2, 0) for t in texts]
         if not self.model:
-            return text
+            return results
 
-        prompt = f"Correct spelling and grammar: {text}"
+        # 1. Lines of segments per text; short, repeated and cached segments skip the model
+        layouts = {}  # text index -> list of lines, each a list of segments
+        refined = {}  # segment -> refined segment (None while pending)
+        owner = {}  # segment -> index of the first text that has it
+        failed = set()
+        for i, t in enumerate(texts):
+            if not t or len(t.strip()) < 2:
+                continue
+            layouts[i] = [split_line(line) for line in t.split("\n")]
+            for segment in (s for line in layouts[i] for s in line):
+                if segment not in refined:
+                    short = len(segment.strip()) < 2
+                    refined[segment] = segment if short else self._cached(segment, strategy)
+                    owner[segment] = i
+        pending = sorted((s for s, out in refined.items() if out is None), key=len)
 
-        try:
-            result = self.model(prompt, max_length=128, num_beams=4, early_stopping=True)
-            corrected = result[0]['generated_text']
-            clean_output = corrected.replace("The text is:", "").replace("Corrected text:", "").strip()
-            return clean_output if clean_output else text
-        except Exception as e:
-            print(f"Error during AI refinement: {e}")
-            return text
+        # 2. One generate call per bucket of similar-length segments
+        for start in range(0, len(pending), REFINE_BUCKET_SIZE):
+            bucket = pending[start:start + REFINE_BUCKET_SIZE]
+            prompts = [f"Correct spelling and grammar: {segment}" for segment in bucket]
+            REFINE_BATCH_SIZE.observe(len(prompts))
+            try:
+                outputs = self.model(prompts, batch_size=len(prompts), **GENERATION_STRATEGIES[strategy])
+            except Exception as e:
+                print(f"Error during batched AI refinement: {e}")
+                refined.update((segment, segment) for segment in bucket)
+                failed.update(bucket)
+                continue
+            for segment, out in zip(bucket, outputs):
+                out = out[0] if isinstance(out, list) else out
+                refined[segment] = self._clean_output(out['generated_text'], segment)
+                self.refine_cache.put(self._refine_key(segment, strategy), refined[segment])
+
+        # 3. Reassemble: segments of a line joined by spaces, lines by the decoder's line breaks
+        tokens = [0] * len(texts)
+        for segment in pending:
+            tokens[owner[segment]] += estimate_tokens(segment)
+        for i, lines in layouts.items():
+            text = "\n".join(" ".join(refined[s] for s in line) for line in lines)
+            results[i] = (text, not any(s in failed for line in lines for s in line), tokens[i])
+        return results
+
+    def _cached(self, segment, strategy):
+        for name in dict.fromkeys(("beam", strategy)):
+            cached = self.refine_cache.get(self._refine_key(segment, name))
+            if cached is not None:
+                return cached
+        return None
+
+    def _refine_key(self, text, strategy="beam"):
+        return make_key("refine", MODEL_NAME, self.backend, GENERATION_STRATEGIES[strategy], normalize_text(text))
+
+    def _clean_output(self, corrected, text):
+        clean_output = corrected.replace("The text is:", "").replace("Corrected text:", "").strip()
+        return clean_output if clean_output else text
 
     def translate_text(self, text, target_lang='hindi'):
-        """Translates Refined English to target language using googletrans."""
-        if not text or not self.translator_engine:
-            return text
-
-        lang_input = target_lang.lower().strip()
-        if lang_input == 'english':
-            return text
-
-        # Mapping for googletrans
-        lang_map = {
-            "hindi": "hi", "tamil": "ta", "telugu": "te", "malayalam": "ml",
-            "marathi": "mr", "bengali": "bn", "kannada": "kn", "gujarati": "gu",
-            "punjabi": "pa", "french": "fr", "spanish": "es", "german": "de", "arabic": "ar"
-        }
+        """Translates Refined English to target language with the configured backend."""
+        return self.translate_batch([text], target_lang)[0]
+
+    def translate_batch(self, texts, target_lang='hindi'):
+        """Translates several refined texts to one language with a single backend call. Keeps input order."""
+        results = list(texts)
+        code = lang_code(target_lang)
+        if code == "en" or not self.translator_engine:
+            return results
 
-        lang_code = lang_map.get(lang_input, lang_input)
+        todo = []
+        source = self.translator_engine.cache_name(code)
+        for i, t in enumerate(texts):
+            if not t:
+                continue
+            cached = self.translate_cache.get(self._translate_key(t, code, source))
+            if cached is not None:
+                results[i] = cached
+            else:
+                todo.append(i)
+        if not todo:
+            return results
 
+        TRANSLATE_BATCH_SIZE.observe(len(todo))
         try:
-            # googletrans version 4.0.0-rc1 is the most stable
-            translated = self.translator_engine.translate(text, dest=lang_code)
-            
-            # Handle potential async returns in some environments
-            if asyncio.iscoroutine(translated):
-                translated = asyncio.run(translated)
-
-            return translated.text
+            outputs = self.translator_engine.translate_batch([texts[i] for i in todo], code)
+            # A pair whose model failed to load just now was translated by the fallback
+            source = self.translator_engine.cache_name(code)
+            for i, out in zip(todo, outputs):
+                results[i] = out
+                self.translate_cache.put(self._translate_key(texts[i], code, source), out)
         except Exception as e:
-            print(f"Googletrans error for {target_lang}: {e}")
-            return text
\ No newline at end of file
+            print(f"Translation error for {target_lang}: {e}")
+        return results
+
+    def _translate_key(self, text, code, source):
+        return make_key(source, code, normalize_text(text))
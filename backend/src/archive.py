@@ -0,0 +1,166 @@
+# braile/backend/src/archive.py
+#
+# Dataset archive of processed scans: uploads go to data/input, debug images to data/output.
+# Files are written by one background thread off the request path, named by the scan's
+# content hash (a repeated scan is stored once) and pruned by age and total size. Only files
+# named that way are ever pruned; other files in the folders are left alone.
+
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from metrics import ARCHIVE_FILES_TOTAL
+
+# The Gradio app saves every scan for the dataset; API uploads are only kept when
+# BRAILLE_API_ARCHIVE=1 (the API itself never needs them after the response)
+ARCHIVE_ENABLED = os.environ.get("BRAILLE_ARCHIVE", "1") != "0"
+API_ARCHIVE_ENABLED = os.environ.get("BRAILLE_API_ARCHIVE", "0") == "1"
+ARCHIVE_DIR = os.environ.get("BRAILLE_ARCHIVE_DIR", "data")
+# Total size of the archived files; beyond it the oldest are deleted (0: no limit)
+ARCHIVE_MAX_MB = float(os.environ.get("BRAILLE_ARCHIVE_MAX_MB", 2048))
+# Files older than this are deleted (0: kept)
+ARCHIVE_MAX_AGE_DAYS = float(os.environ.get("BRAILLE_ARCHIVE_MAX_AGE_DAYS", 90))
+# Scans waiting for the writer; beyond this they are dropped rather than slowing requests
+ARCHIVE_QUEUE_SIZE = int(os.environ.get("BRAILLE_ARCHIVE_QUEUE_SIZE", 64))
+
+INPUT_FOLDER = "input"
+OUTPUT_FOLDER = "output"
+# Names the writer gives its files: the scan's SHA-256 and an extension
+ARCHIVE_NAME_RE = re.compile(r"[0-9a-f]{64}\.[a-z]+")
+
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"), (b"\x89PNG", ".png"), (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"), (b"BM", ".bmp"), (b"RIFF", ".webp"), (b"%PDF-", ".pdf"),
+]
+
+
+def guess_ext(data):
+    for signature, ext in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    return ".bin"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ScanArchive:
+    """
+    Background writer for scans and their debug images. add() only queues; encoding,
+    hashing, writing and pruning happen on the writer thread.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, max_bytes=int(ARCHIVE_MAX_MB * 1024 * 1024),
+                 max_age_days=ARCHIVE_MAX_AGE_DAYS, queue_size=ARCHIVE_QUEUE_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.files = OrderedDict()  # path -> (mtime, size), oldest first; writer thread only
+        self.total_bytes = 0
+
+        entries = []
+        for folder in (INPUT_FOLDER, OUTPUT_FOLDER):
+            path = os.path.join(root, folder)
+            os.makedirs(path, exist_ok=True)
+            entries += [e for e in os.scandir(path) if e.is_file() and ARCHIVE_NAME_RE.fullmatch(e.name)]
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            stat = entry.stat()
+            self.files[entry.path] = (stat.st_mtime, stat.st_size)
+            self.total_bytes += stat.st_size
+
+        self.thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+        self.thread.start()
+
+    def add(self, scan, debug_img=None, digest=None):
+        """
+        Queues one scan (upload bytes or a BGR image) and optionally its debug image; both
+        files are named by the scan's content hash (`digest` if the caller already has it).
+        Never blocks: when the writer is behind, the scan is dropped.
+        """
+        try:
+            self.queue.put_nowait((scan, debug_img, digest))
+        except queue.Full:
+            ARCHIVE_FILES_TOTAL.inc(outcome="dropped")
+
+    def join(self):
+        """Waits until every queued scan is written."""
+        self.queue.join()
+
+    def close(self, timeout=5):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+    def _run(self):
+        self._prune(time.time())
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write_scan(*item)
+            except Exception as e:
+                print(f"[-] Archive write failed: {e}")
+                ARCHIVE_FILES_TOTAL.inc(outcome="failed")
+            finally:
+                self.queue.task_done()
+
+    def _write_scan(self, scan, debug_img, digest):
+        if isinstance(scan, np.ndarray):
+            scan = self._encode(scan)
+            digest = None
+        digest = digest or content_hash(scan)
+        self._write(os.path.join(self.root, INPUT_FOLDER, digest + guess_ext(scan)), scan)
+        if debug_img is not None:
+            output_path = os.path.join(self.root, OUTPUT_FOLDER, digest + ".jpg")
+            # Same scan, same overlay: skip the encode for repeats
+            self._write(output_path, None if output_path in self.files else self._encode(debug_img))
+        self._prune(time.time())
+
+    @staticmethod
+    def _encode(img):
+        ok, buffer = cv2.imencode(".jpg", img)
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buffer.tobytes()
+
+    def _write(self, path, data):
+        now = time.time()
+        if path in self.files:
+            os.utime(path)
+            self.files[path] = (now, self.files[path][1])
+            self.files.move_to_end(path)
+            ARCHIVE_FILES_TOTAL.inc(outcome="duplicate")
+            return
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.files[path] = (now, len(data))
+        self.total_bytes += len(data)
+        ARCHIVE_FILES_TOTAL.inc(outcome="written")
+
+    def _prune(self, now):
+        while self.files:
+            path, (mtime, size) = next(iter(self.files.items()))
+            expired = self.max_age > 0 and mtime < now - self.max_age
+            if not expired and (self.max_bytes <= 0 or self.total_bytes <= self.max_bytes):
+                break
+            del self.files[path]
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            ARCHIVE_FILES_TOTAL.inc(outcome="pruned")
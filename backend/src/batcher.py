@@ -0,0 +1,127 @@
+# braile/backend/src/batcher.py
+
+import asyncio
+import time
+
+
+class RefineBatcher:
+    """
+    Gathers concurrent fix_text() calls for a short window and runs them as one
+    AIRefiner.refine_batch_usage() call per generation strategy. Every caller still gets its
+    own result; the time of each call and the tokens the model got in it are reported to
+    `planner` (a GenerationPlanner), if any.
+    """
+
+    def __init__(self, refiner, max_batch_size=8, max_wait_ms=20, executor=None, planner=None):
+        self.refiner = refiner
+        self.executor = executor
+        self.planner = planner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.queue = None
+        self.worker = None
+
+    def _ensure_worker(self):
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def fix_text(self, text, strategy="beam"):
+        """
+        Returns (text, batch_size, refined, tokens) once the batch holding `text` has run;
+        refined is False if the raw text came back because the model was missing or failed,
+        tokens counts what the text sent to the model (0 when its segments were cached).
+        """
+        return await self._submit((text, strategy))
+
+    async def _submit(self, item):
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _process(self, items):
+        """Runs one batch, one refine_batch_usage() call per strategy; returns each caller's result in order."""
+        results = [None] * len(items)
+        by_strategy = {}
+        for k, (_, strategy) in enumerate(items):
+            by_strategy.setdefault(strategy, []).append(k)
+
+        loop = asyncio.get_running_loop()
+        for strategy, idx in by_strategy.items():
+            texts = [items[k][0] for k in idx]
+            t0 = time.perf_counter()
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.refiner.refine_batch_usage, texts, strategy)
+            except Exception as e:
+                print(f"Error during batched AI refinement: {e}")
+                outputs = [(text, False, 0) for text in texts]
+            else:
+                # Only tokens the model generated for count; a failed call returns at once and
+                # a fully cached batch costs nothing, so neither says anything about the cost
+                tokens = sum(n for _, _, n in outputs)
+                if self.planner is not None and tokens and all(refined for _, refined, _ in outputs):
+                    self.planner.observe(strategy, tokens, time.perf_counter() - t0)
+            print(f"[*] Refined batch of {len(texts)} ({strategy})")
+            for k, (output, refined, n) in zip(idx, outputs):
+                results[k] = (output, len(texts), refined, n)
+        return results
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            results = await self._process([item for item, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+
+class TranslateBatcher(RefineBatcher):
+    """
+    The same gathering window for translate_text() calls. A batch is split by target
+    language and each language goes to AIRefiner.translate_batch() in one call.
+    """
+
+    async def translate_text(self, text, target_lang):
+        """Returns the translation once the batch holding `text` has run."""
+        return await self._submit((text, target_lang))
+
+    async def _process(self, items):
+        results = [text for text, _ in items]
+        by_lang = {}
+        for k, (_, lang) in enumerate(items):
+            by_lang.setdefault(lang, []).append(k)
+
+        loop = asyncio.get_running_loop()
+        for lang, idx in by_lang.items():
+            try:
+                outputs = await loop.run_in_executor(
+                    self.executor, self.refiner.translate_batch, [items[k][0] for k in idx], lang)
+            except Exception as e:
+                print(f"Error during batched translation: {e}")
+                continue
+            for k, output in zip(idx, outputs):
+                results[k] = output
+        return results
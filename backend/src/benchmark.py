@@ -0,0 +1,269 @@
+# braile/backend/src/benchmark.py
+#
+# End-to-end benchmark over the archived scans (run from backend/):
+#   python src/benchmark.py                                   # stub refiner, both modes
+#   python src/benchmark.py --save-baseline data/bench_baseline.json
+#   python src/benchmark.py --baseline data/bench_baseline.json   # exit 1 on regressions
+#   python src/benchmark.py --truth-dir data/truth --refiner real
+#   python src/benchmark.py --detector cc                     # connected-components detector
+# Ground-truth files are optional: <truth-dir>/<scan name>.txt holds the expected text.
+
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from preprocess import locate_scan, clean_image, dots_to_frame
+from detector import detect_dots, DETECTOR
+from tiling import use_tiles, detect_dots_tiled
+from translator import BrailleTranslator
+from cell_engine import CellEngine, dots_to_array, assign_lines
+from pipeline import PHOTO_MODE
+
+MODES = {"digital": "Digital/Black Dots", "photo": PHOTO_MODE}
+STAGES = ["read", "preprocess", "detect", "group_lines", "decode", "post_process", "refine"]
+
+# A stage regresses if its p50/p95 grows by more than the tolerance AND by more than this
+NOISE_FLOOR_MS = 1.0
+
+
+class StubRefiner:
+    """Offline stand-in: returns the raw text, so the rest of the pipeline can be timed."""
+
+    def fix_batch(self, texts):
+        return list(texts)
+
+
+def edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def char_error_rate(hyp, ref):
+    return edit_distance(hyp, ref) / max(len(ref), 1)
+
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q) * 1000) if values else 0.0
+
+
+def run_scan(path, mode, translator, engine, trace_memory, detector=DETECTOR):
+    """Runs one scan through every CV stage, timing each one."""
+    timings = {}
+    if trace_memory:
+        tracemalloc.start()
+
+    t0 = time.perf_counter()
+    img = cv2.imread(path)
+    timings["read"] = time.perf_counter() - t0
+    if img is None:
+        return None
+
+    is_photo = mode == PHOTO_MODE
+    t0 = time.perf_counter()
+    region = locate_scan(img, is_photo)
+    tiled = use_tiles(region.image)
+    thresh = None if tiled else clean_image(region.image, is_photo)
+    timings["preprocess"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if tiled:
+        dots = detect_dots_tiled(region.image, is_photo, detector)
+    else:
+        dots = detect_dots(thresh, detector)
+    dots = dots_to_frame(dots, region)
+    timings["detect"] = time.perf_counter() - t0
+
+    raw, num_cells = "", 0
+    if len(dots):
+        t0 = time.perf_counter()
+        D, line_id = assign_lines(dots_to_array(dots))
+        timings["group_lines"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        result = engine.decode_lines(D, line_id)
+        timings["decode"] = time.perf_counter() - t0
+        num_cells = result.num_cells
+
+        t0 = time.perf_counter()
+        raw = translator.post_process_text(result.text)
+        timings["post_process"] = time.perf_counter() - t0
+
+    peak_kb = None
+    if trace_memory:
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    return {
+        "file": os.path.basename(path),
+        "megapixels": img.shape[0] * img.shape[1] / 1e6,
+        "dots": len(dots),
+        "cells": num_cells,
+        "raw": raw,
+        "timings": timings,
+        "py_peak_kb": peak_kb,
+    }
+
+
+def summarize(records, refine_times):
+    stages = {}
+    for stage in STAGES:
+        values = refine_times if stage == "refine" else [r["timings"][stage] for r in records if stage in r["timings"]]
+        stages[stage] = {
+            "n": len(values),
+            "p50_ms": percentile_ms(values, 50),
+            "p95_ms": percentile_ms(values, 95),
+        }
+    summary = {
+        "scans": len(records),
+        "total_dots": sum(r["dots"] for r in records),
+        "total_cells": sum(r["cells"] for r in records),
+        "stages": stages,
+    }
+    peaks = [r["py_peak_kb"] for r in records if r["py_peak_kb"] is not None]
+    if peaks:
+        summary["py_peak_kb_max"] = max(peaks)
+    scored = [r for r in records if "cer_raw" in r]
+    if scored:
+        summary["cer_raw"] = float(np.mean([r["cer_raw"] for r in scored]))
+        summary["cer_refined"] = float(np.mean([r["cer_refined"] for r in scored]))
+        summary["scored"] = len(scored)
+    return summary
+
+
+def compare(report, baseline, tolerance):
+    """Returns human-readable regressions of `report` against `baseline`."""
+    problems = []
+    for mode, summary in report["modes"].items():
+        base = baseline.get("modes", {}).get(mode)
+        if not base:
+            continue
+        for stage, stats in summary["stages"].items():
+            old = base["stages"].get(stage)
+            if not old:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                new_v, old_v = stats[metric], old[metric]
+                if new_v > old_v * (1 + tolerance) and new_v - old_v > NOISE_FLOOR_MS:
+                    problems.append(f"{mode}/{stage} {metric}: {old_v:.2f} -> {new_v:.2f} ms")
+        for count in ("total_dots", "total_cells"):
+            if summary[count] != base.get(count, summary[count]):
+                problems.append(f"{mode} {count} changed: {base[count]} -> {summary[count]}")
+        for metric in ("cer_raw", "cer_refined"):
+            if metric in summary and metric in base and summary[metric] > base[metric] + 1e-9:
+                problems.append(f"{mode} {metric}: {base[metric]:.4f} -> {summary[metric]:.4f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Braille pipeline over archived scans")
+    parser.add_argument("--input", default="data/input", help="Folder of scan_*.jpg files")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N scans")
+    parser.add_argument("--truth-dir", help="Folder of <scan name>.txt ground-truth files")
+    parser.add_argument("--refiner", choices=["stub", "real", "none"], default="stub")
+    parser.add_argument("--detector", choices=["contours", "cc"], default=DETECTOR)
+    parser.add_argument("--trace-memory", action="store_true", help="Record Python peak memory per scan (slower)")
+    parser.add_argument("--baseline", help="Compare against this saved report; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown (default 20%%)")
+    parser.add_argument("--save-baseline", help="Write this run's report as a baseline JSON")
+    parser.add_argument("--output", help="Write the full report, including per-scan records")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.input, "*.jpg")) + glob.glob(os.path.join(args.input, "*.png")))
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        sys.exit(f"No scans found in {args.input}")
+
+    translator = BrailleTranslator()
+    engine = CellEngine(translator)
+    refiner = None
+    if args.refiner == "stub":
+        refiner = StubRefiner()
+    elif args.refiner == "real":
+        from ai_refiner import AIRefiner
+        refiner = AIRefiner(cache_path=None)
+        refiner.load()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "refiner": args.refiner,
+        "detector": args.detector,
+        "modes": {},
+    }
+    all_records = {}
+
+    for mode_name in args.modes:
+        mode = MODES[mode_name]
+        records = [r for r in (run_scan(p, mode, translator, engine, args.trace_memory, args.detector) for p in paths) if r]
+
+        # Refinement is timed per text so p50/p95 stay comparable between stub and real runs
+        refine_times = []
+        for r in records:
+            r["refined"] = r["raw"]
+            if refiner is not None and r["raw"]:
+                t0 = time.perf_counter()
+                r["refined"] = refiner.fix_batch([r["raw"]])[0]
+                refine_times.append(time.perf_counter() - t0)
+
+        if args.truth_dir:
+            for r in records:
+                truth_path = os.path.join(args.truth_dir, os.path.splitext(r["file"])[0] + ".txt")
+                if os.path.exists(truth_path):
+                    with open(truth_path, encoding="utf-8") as f:
+                        truth = f.read().strip()
+                    r["cer_raw"] = char_error_rate(r["raw"], truth)
+                    r["cer_refined"] = char_error_rate(r["refined"], truth)
+
+        report["modes"][mode_name] = summarize(records, refine_times)
+        all_records[mode_name] = records
+
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    # Console summary
+    for mode_name, summary in report["modes"].items():
+        print(f"\n== {mode_name}: {summary['scans']} scans, {summary['total_dots']} dots, {summary['total_cells']} cells")
+        for stage, stats in summary["stages"].items():
+            print(f"  {stage:<13} p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms   (n={stats['n']})")
+        if "cer_raw" in summary:
+            print(f"  CER raw {summary['cer_raw']:.3f}, refined {summary['cer_refined']:.3f} over {summary['scored']} scans")
+    print(f"\nPeak RSS: {report['peak_rss_mb']:.0f} MB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({**report, "records": all_records}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(report, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSIONS:")
+            for p in problems:
+                print(f"  - {p}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# braile/backend/src/braille_stream.py
+#
+# Chunked decoding of large Braille documents (BRF / Unicode Braille):
+#   python braille_stream.py book.brf > book.txt
+
+import argparse
+import codecs
+import mmap
+import re
+import sys
+
+from translator import BrailleTranslator, NUM_MAP
+
+CHUNK_SIZE = 64 * 1024
+
+# North American Braille ASCII: character i is the cell U+2800 + i
+BRF_CELLS = " A1B'K2L@CIF/MSP\"E3H9O6R^DJG>NTQ,*5<-U8V.%[$+X!&;:4\\0Z7(_?W]#Y)="
+# Some files use lower case (a-z and `{|}~ for @[\]^); page breaks become line breaks
+BRF_LOWER = {"`": "@", "{": "[", "|": "\\", "}": "]", "~": "^"}
+BRF_TABLE = {**{c: chr(0x2800 + i) for i, c in enumerate(BRF_CELLS)},
+             **{c.lower(): chr(0x2800 + i) for i, c in enumerate(BRF_CELLS) if c.isalpha()},
+             **{low: chr(0x2800 + BRF_CELLS.index(up)) for low, up in BRF_LOWER.items()},
+             "\r": None, "\f": "\n"}
+
+# Number mode is still on at the end of a chunk if its last '#' is only followed by number cells
+OPEN_NUMBER_RE = re.compile("#+[" + re.escape("".join(NUM_MAP)) + "]*\\Z")
+
+
+def is_brf(sample, filename=""):
+    """BRF files are plain ASCII; Unicode Braille uses the U+2800 block."""
+    if filename.lower().endswith(".brf"):
+        return True
+    return not any("⠀" <= c <= "⣿" for c in sample)
+
+
+class BrailleStreamDecoder:
+    """
+    Decodes a Braille document chunk by chunk with the same result as decoding it
+    in one piece: UTF-8 sequences and number mode are carried across chunk boundaries.
+    """
+
+    def __init__(self, translator=None, brf=None):
+        self.translator = translator or BrailleTranslator()
+        self.brf = brf
+        self.brf_table = str.maketrans(BRF_TABLE)
+        self.utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.number_mode = False
+
+    def feed_bytes(self, data, final=False):
+        return self.feed(self.utf8.decode(data, final))
+
+    def feed(self, chunk):
+        if not chunk:
+            return ""
+        if self.brf is None:
+            self.brf = is_brf(chunk)
+        if self.brf:
+            chunk = chunk.translate(self.brf_table)
+
+        raw = self.translator.braille_to_text(chunk)
+        # Re-open number mode from the previous chunk with a '#' that post-processing drops
+        if self.number_mode:
+            raw = "#" + raw
+        self.number_mode = OPEN_NUMBER_RE.search(raw) is not None
+        return self.translator.post_process_text(raw)
+
+
+def iter_decode_bytes(chunks, filename="", translator=None):
+    """Decodes an iterable of byte chunks, yielding text as it goes."""
+    decoder = None
+    for data in chunks:
+        if decoder is None:
+            decoder = BrailleStreamDecoder(translator, brf=is_brf(data[:4096].decode("utf-8", "ignore"), filename))
+        text = decoder.feed_bytes(data)
+        if text:
+            yield text
+    if decoder is not None:
+        text = decoder.feed_bytes(b"", final=True)
+        if text:
+            yield text
+
+
+def iter_decode_file(path, chunk_size=CHUNK_SIZE, translator=None):
+    """Decodes a local Braille file through a memory map, never reading it whole."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return
+        with mm:
+            chunks = (mm[i:i + chunk_size] for i in range(0, len(mm), chunk_size))
+            yield from iter_decode_bytes(chunks, path, translator)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a BRF / Unicode Braille file to text")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    out = sys.stdout
+    for text in iter_decode_file(args.path, args.chunk_size):
+        out.write(text)
+    out.flush()
+
+
+if __name__ == "__main__":
+    main()
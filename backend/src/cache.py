@@ -0,0 +1,280 @@
+# braile/backend/src/cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Collapses whitespace so trivially different inputs share a cache entry."""
+    return " ".join(text.split())
+
+
+def make_key(*parts):
+    """Stable hash of any JSON-serializable key parts (text, model name, parameters...)."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier string cache: an in-memory LRU in front of a SQLite table that
+    survives restarts. Both tiers are size-bounded and evict least-recently-used entries.
+    With `ttl` (seconds), entries older than that are treated as missing.
+    """
+
+    def __init__(self, db_path, table, max_memory_items=1024, max_disk_items=50000, ttl=None):
+        self.table = table
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        self.db = None
+        self.disk_count = 0
+
+        if db_path:
+            try:
+                folder = os.path.dirname(db_path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL, created REAL NOT NULL DEFAULT 0)"
+                )
+                columns = [row[1] for row in self.db.execute(f"PRAGMA table_info({table})")]
+                if "created" not in columns:
+                    self.db.execute(f"ALTER TABLE {table} ADD COLUMN created REAL NOT NULL DEFAULT 0")
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+                self.db.commit()
+                self.disk_count = self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            except sqlite3.Error as e:
+                print(f"[-] Disk cache '{table}' unavailable: {e}")
+                self.db = None
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        with self.lock:
+            now = time.time()
+            if key in self.memory:
+                value, created = self.memory[key]
+                if not self._expired(created, now):
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.memory[key]
+
+            if self.db is not None:
+                try:
+                    row = self.db.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                    if row is not None and self._expired(row[1], now):
+                        self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                        self.db.commit()
+                        self.disk_count -= 1
+                    elif row is not None:
+                        self.db.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+                        self.db.commit()
+                        self.disk_hits += 1
+                        self._remember(key, row[0], row[1])
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"[-] Disk cache read failed: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            now = time.time()
+            self._remember(key, value, now)
+            if self.db is None:
+                return
+            try:
+                exists = self.db.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                self.db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, last_used, created) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                if not exists:
+                    self.disk_count += 1
+                if self.disk_count > self.max_disk_items:
+                    # Trim 10% below the limit so we don't evict on every insert
+                    excess = self.disk_count - int(self.max_disk_items * 0.9)
+                    self.db.execute(
+                        f"DELETE FROM {self.table} WHERE key IN "
+                        f"(SELECT key FROM {self.table} ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                    self.disk_count -= excess
+                    self.disk_evictions += excess
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"[-] Disk cache write failed: {e}")
+
+    def _remember(self, key, value, created):
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_items": len(self.memory),
+                "disk_items": self.disk_count,
+            }
+
+
+class AudioCache:
+    """
+    Content-addressed audio files (<key>.<ext>) in one directory, bounded by their total
+    size. Hits refresh a file's mtime so the least recently played files are evicted first,
+    also across restarts.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.files = OrderedDict()  # key -> (file name, size), least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        entries = sorted(os.scandir(directory), key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                # Left behind by a synthesis that was interrupted by a restart
+                os.remove(entry.path)
+                continue
+            size = entry.stat().st_size
+            self.files[entry.name.split(".")[0]] = (entry.name, size)
+            self.total_bytes += size
+        self._evict()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.files
+
+    def get(self, key):
+        """Path of the cached file for `key`, or None."""
+        with self.lock:
+            entry = self.files.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.files.move_to_end(key)
+            self.hits += 1
+        path = os.path.join(self.directory, entry[0])
+        try:
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                if self.files.pop(key, None) is not None:
+                    self.total_bytes -= entry[1]
+            return None
+        return path
+
+    def fill(self, key, ext, chunks):
+        """
+        Yields `chunks` while writing them to a temporary file, which becomes the cache entry
+        once the last chunk is through. Failed or abandoned streams leave nothing behind.
+        """
+        name = f"{key}.{ext}"
+        # A unique temporary file per synthesis: two streams of one key never share it
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f"{name}.", suffix=".part")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(tmp, os.path.join(self.directory, name))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        with self.lock:
+            old = self.files.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.files[key] = (name, size)
+            self.total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        # The newest file stays even if it alone is over the limit
+        while self.total_bytes > self.max_bytes and len(self.files) > 1:
+            _, (name, size) = self.files.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "disk_hits": self.hits,
+                "misses": self.misses,
+                "disk_evictions": self.evictions,
+                "disk_items": len(self.files),
+                "disk_bytes": self.total_bytes,
+            }
+
+
+class ScanStore:
+    """
+    Recent uploads and their decoded cell rects by result ID, so a debug image can be
+    rendered when it is asked for. In memory, bounded by total upload bytes (LRU).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.scans = OrderedDict()  # result id -> (upload bytes, rects)
+        self.total_bytes = 0
+
+    def put(self, result_id, contents, rects):
+        with self.lock:
+            old = self.scans.pop(result_id, None)
+            if old is not None:
+                self.total_bytes -= len(old[0])
+            self.scans[result_id] = (contents, rects)
+            self.total_bytes += len(contents)
+            while self.total_bytes > self.max_bytes and len(self.scans) > 1:
+                _, (evicted, _) = self.scans.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def get(self, result_id):
+        """(upload bytes, rects), or None once the scan has been evicted."""
+        with self.lock:
+            entry = self.scans.get(result_id)
+            if entry is not None:
+                self.scans.move_to_end(result_id)
+            return entry
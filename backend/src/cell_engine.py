@@ -0,0 +1,199 @@
+# braile/backend/src/cell_engine.py
+
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Column layout of the dot array built from detect_dots() tuples
+X, Y, W, H, CX, CY = range(6)
+
+DecodeResult = namedtuple("DecodeResult", ["text", "rects", "S_x", "S_y", "stride", "num_dots", "num_cells"])
+# Page geometry measured on one frame and reused for the next ones (live camera mode)
+Calibration = namedtuple("Calibration", ["S_x", "S_y", "stride", "dot_px"])
+
+
+def dots_to_array(dots):
+    """Packs (x, y, w, h, cx, cy) dots into one float64 array of shape (N, 6)."""
+    return np.asarray(dots, dtype=np.float64).reshape(-1, 6)
+
+
+def assign_lines(D):
+    """Sorts the dots by cy and gives each a line id; a gap of 1.8 median dot heights starts a new line."""
+    D = D[np.argsort(D[:, CY], kind="stable")]
+    avg_h = np.median(D[:, H])
+    breaks = np.diff(D[:, CY]) >= avg_h * 1.8
+    line_id = np.concatenate(([0], np.cumsum(breaks)))
+    return D, line_id
+
+
+def estimate_pitch(D, line_id):
+    """Estimates the horizontal (S_x) and vertical (S_y) dot pitch from in-line gaps."""
+    avg_dot_w = np.median(D[:, W])
+    same_line = line_id[1:] == line_id[:-1]
+
+    # Gaps between neighbouring dots of the same line, in x order and in y order
+    order_x = np.lexsort((D[:, CX], line_id))
+    xs = D[order_x, CX]
+    dx = np.diff(xs)[line_id[order_x][1:] == line_id[order_x][:-1]]
+    dy = np.diff(D[:, CY])[same_line]
+    dx_list = dx[dx > avg_dot_w * 0.5]
+    dy_list = dy[dy > avg_dot_w * 0.5]
+
+    if dy_list.size:
+        S_y = np.percentile(dy_list, 25)
+    elif dx_list.size:
+        S_y = np.percentile(dx_list, 10)
+    else:
+        S_y = avg_dot_w * 2.5
+
+    if dx_list.size:
+        raw_Sx = np.percentile(dx_list, 10)
+        S_x = min(raw_Sx, S_y * 1.3) if dy_list.size else raw_Sx
+    else:
+        S_x = S_y
+
+    S_x = max(S_x, avg_dot_w * 1.2)
+    S_y = max(S_y, avg_dot_w * 1.2)
+    return S_x, S_y
+
+
+def _group_median(values, groups, num_groups, default):
+    """Median of `values` per group id, `default` for groups without values."""
+    out = np.full(num_groups, default, dtype=np.float64)
+    if values.size == 0:
+        return out
+    order = np.lexsort((values, groups))
+    v = values[order]
+    counts = np.bincount(groups, minlength=num_groups)
+    starts = np.cumsum(counts) - counts
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    out[has] = (v[lo] + v[hi]) / 2
+    return out
+
+
+def _resolve_chain(T0, T1):
+    """
+    Resolves b[k] = T[k](b[k-1]) for every k with a log-step prefix composition.
+    T0/T1 hold each step's output for an input of 0/1; step 0 must be constant.
+    """
+    A0, A1 = T0.copy(), T1.copy()
+    s = 1
+    while s < len(A0):
+        prev0, prev1 = A0[:-s], A1[:-s]
+        cur0, cur1 = A0[s:], A1[s:]
+        A0[s:], A1[s:] = np.where(prev0, cur1, cur0), np.where(prev1, cur1, cur0)
+        s *= 2
+    return A0
+
+
+class CellEngine:
+    def __init__(self, translator):
+        self.lut = translator.cell_lut
+
+    def decode(self, dots, calibration=None):
+        """Decodes detected dots into raw Braille text plus one debug rectangle per cell."""
+        D = dots_to_array(dots)
+        if len(D) == 0:
+            return DecodeResult("", np.empty((0, 4), dtype=np.int64), 0.0, 0.0, 0.0, 0, 0)
+        return self.decode_lines(*assign_lines(D), calibration)
+
+    def decode_lines(self, D, line_id, calibration=None):
+        """
+        Same as decode() for dots already sorted and grouped by assign_lines(). A Calibration
+        replaces the pitch estimate and the default cell stride with earlier measurements.
+        """
+        if calibration is None:
+            S_x, S_y = estimate_pitch(D, line_id)
+            default_stride = S_x * 2.6
+        else:
+            S_x, S_y, default_stride = calibration.S_x, calibration.S_y, calibration.stride
+        num_lines = int(line_id[-1]) + 1
+
+        # 1. Sort every line left to right and split it into cells at wide x gaps
+        order = np.lexsort((D[:, CX], line_id))
+        D, line_id = D[order], line_id[order]
+        cx, cy = D[:, CX], D[:, CY]
+        line_top_cy = np.minimum.reduceat(cy, np.flatnonzero(np.r_[True, line_id[1:] != line_id[:-1]]))
+
+        new_cell = np.r_[True, (line_id[1:] != line_id[:-1]) | (np.diff(cx) > S_x * 1.4)]
+        cell_start = np.flatnonzero(new_cell)
+        cell_end = np.r_[cell_start[1:], len(D)]
+        cell_id = np.cumsum(new_cell) - 1
+        first_cx = cx[cell_start]
+        last_cx = cx[cell_end - 1]
+        cell_line = line_id[cell_start]
+        line_first = np.r_[True, cell_line[1:] != cell_line[:-1]]
+        num_cells = len(cell_start)
+
+        # 2. Per-line Cell_Stride from the spacing of neighbouring cells
+        d_cx = first_cx[1:] - last_cx[:-1]
+        valid = ~line_first[1:] & (S_x * 1.0 < d_cx) & (d_cx < S_x * 3.5)
+        strides = (first_cx[1:] - first_cx[:-1])[valid]
+        Cell_Stride = _group_median(strides, cell_line[1:][valid], num_lines, default_stride)
+        page_stride = float(np.median(strides)) if strides.size else default_stride
+        stride = Cell_Stride[cell_line]
+
+        # 3. Starting anchor of each line: a narrow first cell close to its neighbour is a right column
+        line_start = np.flatnonzero(line_first)
+        anchor = first_cx[line_start].copy()
+        has_next = np.r_[line_start[1:], num_cells] - line_start > 1
+        nxt = np.minimum(line_start + 1, num_cells - 1)
+        narrow = (last_cx[line_start] - first_cx[line_start]) < S_x * 0.5
+        close = (first_cx[nxt] - first_cx[line_start]) < Cell_Stride * 0.8
+        shifted = narrow & has_next & close
+        anchor[shifted] = first_cx[line_start][shifted] - S_x
+
+        # 4. Each cell's anchor depends on whether the previous cell snapped to its right column.
+        #    Evaluate both outcomes per cell, then resolve the chain in one pass.
+        prev_cx = np.r_[first_cx[0], first_cx[:-1]]
+        line_anchor = anchor[cell_line]
+        expected0 = np.where(line_first, line_anchor, prev_cx)
+        expected1 = np.where(line_first, line_anchor, prev_cx - S_x)
+
+        def _step(expected):
+            num_strides = np.maximum(0, np.rint((first_cx - expected) / stride))
+            current = expected + num_strides * stride
+            right = np.abs(first_cx - (current + S_x)) < np.abs(first_cx - current)
+            return right, num_strides
+
+        right0, strides0 = _step(expected0)
+        right1, strides1 = _step(expected1)
+        right = _resolve_chain(right0, right1)
+        prev_right = np.r_[False, right[:-1]]
+        num_strides = np.where(prev_right, strides1, strides0).astype(np.int64)
+        cell_anchor = np.where(right, first_cx - S_x, first_cx)
+
+        # 5. Every dot sets one bit of its cell's 6-bit code; decode all cells via the lookup table
+        col = (cx - cell_anchor[cell_id]) > (S_x * 0.5)
+        dy = cy - line_top_cy[line_id]
+        row = np.where(dy < S_y * 0.5, 0, np.where(dy < S_y * 1.5, 1, 2))
+        bits = np.left_shift(1, row + 3 * col)
+        codes = np.bitwise_or.reduceat(bits, cell_start)
+        chars = self.lut[codes].tolist()
+
+        top = line_top_cy[cell_line]
+        rects = np.stack([
+            cell_anchor - S_x * 0.4,
+            top - S_y * 0.5,
+            cell_anchor + S_x * 1.4,
+            top + S_y * 2.5,
+        ], axis=1).astype(np.int64)
+
+        # 6. Re-insert word gaps and line breaks
+        gaps = np.where(line_first, 0, np.maximum(num_strides - 1, 0)).tolist()
+        pieces = [
+            ("\n" if first and k else "") + " " * gap + char
+            for k, (first, gap, char) in enumerate(zip(line_first.tolist(), gaps, chars))
+        ]
+        text = "".join(pieces).strip()
+        return DecodeResult(text, rects, S_x, S_y, page_stride, len(D), num_cells)
+
+
+def draw_cells(img, rects, color=(0, 255, 0)):
+    """Draws the decoded cell rectangles onto the debug image."""
+    for x1, y1, x2, y2 in rects.tolist():
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+    return img
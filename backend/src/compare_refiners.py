@@ -0,0 +1,115 @@
+# braile/backend/src/compare_refiners.py
+#
+# Compares refiner backends on a fixed set of raw decoder outputs:
+#   python compare_refiners.py [--backends transformers onnx] [--repeat 3]
+# Each backend runs in its own process so peak memory is measured in isolation.
+
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import statistics
+import time
+
+from ai_refiner import MODEL_NAME, GENERATION_KWARGS
+
+# Typical raw outputs of BrailleTranslator.post_process_text, errors included
+SAMPLE_TEXTS = [
+    "athul m",
+    "'a t  h  u  l 'm",
+    "thul?",
+    "helo wrld",
+    "the quick brown fox jumps ovr the lazy dog",
+    "braile is a tactile writing sistem",
+    "exit",
+    "room 12 is on the secnd floor",
+    "pleas keep the door closd",
+    "chapter 3 the water cycle",
+    "wash your hnds before eating",
+    "emergency exit ?n the left",
+]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _run_backend(backend, repeat, queue):
+    try:
+        import torch
+        from refiner_backends import build_pipeline
+
+        device = 0 if torch.cuda.is_available() else -1
+        t0 = time.perf_counter()
+        model, used = build_pipeline(MODEL_NAME, device, backend)
+        load_s = time.perf_counter() - t0
+        model("Correct spelling and grammar: warm up", **GENERATION_KWARGS)
+
+        latencies, outputs = [], []
+        for _ in range(repeat):
+            outputs = []
+            for text in SAMPLE_TEXTS:
+                t0 = time.perf_counter()
+                result = model(f"Correct spelling and grammar: {text}", **GENERATION_KWARGS)
+                latencies.append(time.perf_counter() - t0)
+                outputs.append(result[0]["generated_text"].strip())
+
+        queue.put({
+            "backend": used,
+            "load_s": load_s,
+            "latency_ms_mean": statistics.mean(latencies) * 1000,
+            "latency_ms_p50": statistics.median(latencies) * 1000,
+            "latency_ms_p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+            "peak_rss_mb": _peak_rss_mb(),
+            "outputs": outputs,
+        })
+    except Exception as e:
+        queue.put({"backend": backend, "error": str(e)})
+
+
+def measure(backend, repeat):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_backend, args=(backend, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare refiner backends")
+    parser.add_argument("--backends", nargs="+", default=["transformers", "onnx"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    results = [measure(b, args.repeat) for b in args.backends]
+    reference = next((r for r in results if "outputs" in r), None)
+
+    print(f"{'backend':<14}{'load s':>8}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'peak MB':>10}{'agree':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<14} failed: {r['error']}")
+            continue
+        same = sum(a == b for a, b in zip(r["outputs"], reference["outputs"]))
+        r["agreement"] = same / len(SAMPLE_TEXTS)
+        print(f"{r['backend']:<14}{r['load_s']:>8.1f}{r['latency_ms_mean']:>10.1f}{r['latency_ms_p50']:>9.1f}"
+              f"{r['latency_ms_p95']:>9.1f}{r['peak_rss_mb']:>10.0f}{r['agreement']:>8.0%}")
+
+    # Show where the backends disagree
+    for r in results:
+        if r is reference or "outputs" not in r:
+            continue
+        for text, a, b in zip(SAMPLE_TEXTS, reference["outputs"], r["outputs"]):
+            if a != b:
+                print(f"  [{r['backend']}] {text!r}: {a!r} vs {b!r}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# braile/backend/src/deadline.py
+#
+# Latency budgets for refinement: each request may carry a budget, and the generation
+# strategy is picked from how much work is already waiting for the model and what a
+# token has recently cost with each strategy.
+
+import threading
+from contextlib import contextmanager
+
+# Strategies from best to cheapest; "raw" returns the decode without the model
+STRATEGIES = ("beam", "greedy")
+RAW = "raw"
+# Until greedy search has run once it is assumed to cost this share of beam search
+GREEDY_COST_GUESS = 0.5
+# Weight of the newest batch in the moving per-token cost
+COST_SMOOTHING = 0.2
+# Flan-T5's SentencePiece vocabulary averages about 4 characters of English per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class GenerationPlanner:
+    """
+    Picks beam search while the estimated finish time fits the budget, greedy search when
+    only that fits, and the raw decode otherwise. The estimate is (tokens already queued
+    for the model + the request's own) x the measured seconds per token of the strategy.
+    """
+
+    def __init__(self, smoothing=COST_SMOOTHING):
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.cost = {}  # strategy -> seconds per token, moving average
+        self.pending_tokens = 0
+
+    def observe(self, strategy, tokens, seconds):
+        """Records one refinement call: the model took `seconds` for `tokens` input tokens (cache misses only)."""
+        per_token = seconds / max(1, tokens)
+        with self.lock:
+            previous = self.cost.get(strategy)
+            self.cost[strategy] = per_token if previous is None else previous + self.smoothing * (per_token - previous)
+
+    def estimate(self, strategy, tokens):
+        """Seconds until a request of `tokens` would be refined, or None before any measurement."""
+        with self.lock:
+            cost = self.cost.get(strategy)
+            if cost is None and strategy == "greedy" and "beam" in self.cost:
+                cost = self.cost["beam"] * GREEDY_COST_GUESS
+            pending = self.pending_tokens
+        return None if cost is None else (pending + tokens) * cost
+
+    def choose(self, tokens, remaining=None):
+        """Best strategy that fits `remaining` seconds (None: no budget, always beam search)."""
+        if remaining is None:
+            return STRATEGIES[0]
+        for strategy in STRATEGIES:
+            estimate = self.estimate(strategy, tokens)
+            # Nothing measured yet: the first refinements run as normal and calibrate the costs
+            if estimate is None or estimate <= remaining:
+                return strategy
+        return RAW
+
+    @contextmanager
+    def queued(self, tokens):
+        """Counts a request's tokens as waiting for the model while the block runs."""
+        with self.lock:
+            self.pending_tokens += tokens
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pending_tokens -= tokens
+
+    def stats(self):
+        with self.lock:
+            return {"pending_tokens": self.pending_tokens,
+                    "ms_per_token": {k: round(v * 1000, 3) for k, v in self.cost.items()}}
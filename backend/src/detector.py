@@ -1,15 +1,42 @@
 # braile/backend/src/detector.py
 
+import os
+
 import cv2
 import numpy as np
 
-def detect_dots(thresh_img):
+# "contours" = findContours + a Python loop per contour (fastest on clean scans),
+# "cc" = connected components + NumPy filtering (faster on noisy photos with many blobs)
+DETECTOR = os.environ.get("BRAILLE_DETECTOR", "contours")
+
+def detect_dots(thresh_img, method=None):
+    """Returns the dots of a binary image as (x, y, w, h, cx, cy) rows."""
+    if (method or DETECTOR) == "contours":
+        return detect_dots_contours(thresh_img)
+    return detect_dots_cc(thresh_img)
+
+def dot_candidates(thresh_img, method=None):
+    """Step 1 of detect_dots() only: (area, x, y, w, h) rows of the blobs that pass the noise filter."""
+    if (method or DETECTOR) == "contours":
+        return np.asarray(contour_candidates(thresh_img), dtype=np.float64).reshape(-1, 5)
+    return cc_candidates(thresh_img)
+
+def select_dots(candidates):
+    """Steps 2-3 of detect_dots() on (area, x, y, w, h) rows: keep blobs near the true dot size."""
+    if len(candidates) == 0:
+        return np.empty((0, 6), dtype=np.float64)
+    areas, x, y, w, h = candidates.T
+    target_area = np.percentile(areas, 98)
+    keep = (0.4 * target_area < areas) & (areas < 2.5 * target_area)
+    x, y, w, h = x[keep], y[keep], w[keep], h[keep]
+    return np.stack([x, y, w, h, x + w / 2.0, y + h / 2.0], axis=1)
+
+def contour_candidates(thresh_img):
     contours, _ = cv2.findContours(
         thresh_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
     )
-    dots =[]
     valid_contours =[]
-    
+
     # 1. Filter out extreme noise and the massive black bar on the left
     for c in contours:
         x, y, w, h = cv2.boundingRect(c)
@@ -18,6 +45,11 @@ def detect_dots(thresh_img):
         # 5 to 15000 easily covers dots while rejecting huge bars
         if 5 < area < 15000 and 0.3 < aspect_ratio < 3.0:
             valid_contours.append((area, x, y, w, h))
+    return valid_contours
+
+def detect_dots_contours(thresh_img):
+    dots =[]
+    valid_contours = contour_candidates(thresh_img)
             
     if not valid_contours:
         return dots
@@ -35,22 +67,62 @@ def detect_dots(thresh_img):
             
     return dots
 
-def group_dots_into_lines(dots):
-    if not dots:
-        return[]
+# Bit per background neighbour: N=1, NE=2, E=4, SE=8, S=16, SW=32, W=64, NW=128
+NEIGHBOUR_KERNEL = np.array([[128, 1, 2], [64, 0, 4], [32, 16, 8]], np.float32)
 
-    dots.sort(key=lambda k: k[5])
-    lines = []
-    curr_line = [dots[0]]
-    
-    avg_h = np.median([d[3] for d in dots])
+def _contour_steps_lut():
+    """Contour steps through a pixel per neighbour code: background runs that touch a 4-neighbour."""
+    lut = np.zeros(256, np.uint8)
+    for code in range(256):
+        n, ne, e, se, s, sw, w, nw = [(code >> i) & 1 for i in range(8)]
+        lut[code] = (n and not (nw and w)) + (e and not (ne and n)) + (s and not (se and e)) + (w and not (sw and s))
+    return lut
+
+CONTOUR_STEPS_LUT = _contour_steps_lut()
+
+def component_contour_areas(thresh_img):
+    """
+    Bounding boxes and cv2.contourArea() values of every outer contour, without tracing them.
+
+    Holes are filled first, so each 8-connected component matches one RETR_EXTERNAL contour.
+    The contour runs through the centres of its boundary pixels, so by Pick's theorem its
+    area is pixels - steps/2 - 1, where a boundary pixel is stepped on once per run of
+    outside background around it (twice on one-pixel-wide necks).
+    """
+    fg = cv2.copyMakeBorder((thresh_img > 0).view(np.uint8), 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
 
-    for i in range(1, len(dots)):
-        if abs(dots[i][5] - curr_line[-1][5]) < (avg_h * 1.8):
-            curr_line.append(dots[i])
-        else:
-            lines.append(curr_line)
-            curr_line =[dots[i]]
+    # 1. Fill holes: background that is not 4-connected to the border
+    outside = 1 - fg
+    cv2.floodFill(outside, None, (0, 0), 2, flags=4)
+    bg = (outside == 2).view(np.uint8)
+    filled = 1 - bg
+    num, labels, stats, _ = cv2.connectedComponentsWithStats(filled, connectivity=8)
+
+    # 2. Contour length of each component from its boundary pixels
+    code = cv2.filter2D(bg, cv2.CV_8U, NEIGHBOUR_KERNEL, borderType=cv2.BORDER_CONSTANT)
+    steps = cv2.multiply(cv2.LUT(code, CONTOUR_STEPS_LUT), filled)
+    perimeter = np.zeros(num)
+    boundary = cv2.findNonZero(steps)
+    if boundary is not None:
+        xs, ys = boundary.reshape(-1, 2).T
+        perimeter = np.bincount(labels[ys, xs], weights=steps[ys, xs], minlength=num)
+
+    pixels = stats[:, cv2.CC_STAT_AREA]
+    areas = np.where(pixels == 1, 0.0, pixels - perimeter / 2 - 1)
+    boxes = stats[1:, :4] - [1, 1, 0, 0]
+    return boxes, areas[1:]
+
+def cc_candidates(thresh_img):
+    """contour_candidates() on connected components, as NumPy masks over all blobs at once."""
+    boxes, areas = component_contour_areas(thresh_img)
+    x, y, w, h = boxes.T.astype(np.float64)
+    aspect_ratio = w / np.maximum(h, 1)
+
+    # 1. Filter out extreme noise and the massive black bar on the left
+    valid = (5 < areas) & (areas < 15000) & (0.3 < aspect_ratio) & (aspect_ratio < 3.0)
+    return np.stack([areas, x, y, w, h], axis=1)[valid]
 
-    lines.append(curr_line)
-    return lines
\ No newline at end of file
+def detect_dots_cc(thresh_img):
+    """detect_dots() on connected components: the same filters, as NumPy masks over all blobs at once."""
+    # 2. 98th percentile = size of the true filled dots; 3. reject placeholder dots
+    return select_dots(cc_candidates(thresh_img))
@@ -0,0 +1,232 @@
+# braile/backend/src/document.py
+#
+# Multi-page documents (PDF, multi-page TIFF) one page at a time: pages are rasterized
+# lazily, share one geometry calibration, and their text is stitched and cut into sections
+# for refinement, so memory stays flat however long the book is (run from backend/):
+#   python src/document.py book.pdf --mode photo --output book.txt
+#   python src/document.py book.tif --refiner none --ndjson
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from pipeline import CalibratedScanner, PHOTO_MODE
+from metrics import REFINE_PATH_TOTAL
+
+DOC_PDF_DPI = int(os.environ.get("BRAILLE_DOC_DPI", 300))
+# Pages of one document share the calibration unless the dot size moves by more than this
+DOC_DRIFT_TOLERANCE = float(os.environ.get("BRAILLE_DOC_DRIFT", 0.1))
+# A page needs this many cells to calibrate the rest (title pages and blanks don't)
+DOC_MIN_CALIBRATION_CELLS = int(os.environ.get("BRAILLE_DOC_MIN_CALIBRATION_CELLS", 40))
+# Target size of a refinement section (the refiner cuts it into model-sized segments itself)
+DOC_SECTION_CHARS = int(os.environ.get("BRAILLE_DOC_SECTION_CHARS", 300))
+
+SENTENCE_ENDS = (".", "!", "?", ":", ";")
+MODES = {"digital": "Digital/Black Dots", "photo": PHOTO_MODE}
+
+
+def open_document(path):
+    """Returns (page_count, iterator of BGR pages). Pages are read only when iterated."""
+    with open(path, "rb") as f:
+        head = f.read(5)
+    if head == b"%PDF-":
+        return _pdf_pages(path)
+
+    # TIFF (and any single image OpenCV reads): one directory decoded per step
+    count = cv2.imcount(path)
+    if count == 0:
+        raise ValueError("Unsupported document: expected a PDF, a TIFF or an image")
+
+    def pages():
+        for i in range(count):
+            ok, mats = cv2.imreadmulti(path, i, 1, flags=cv2.IMREAD_COLOR)
+            yield mats[0] if ok and mats else None
+
+    return count, pages()
+
+
+def _pdf_pages(path):
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        raise RuntimeError("PDF input needs PyMuPDF (pip install pymupdf)")
+    doc = fitz.open(path)
+
+    def pages():
+        try:
+            for page in doc:
+                pix = page.get_pixmap(dpi=DOC_PDF_DPI, colorspace=fitz.csRGB, alpha=False)
+                rows = np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.stride)
+                rgb = rows[:, :pix.width * 3].reshape(pix.height, pix.width, 3)
+                yield cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        finally:
+            doc.close()
+
+    return doc.page_count, pages()
+
+
+class DocumentStitcher:
+    """
+    Joins page texts into one running text and cuts it into refinement sections of about
+    `section_chars`, ending at the last paragraph or sentence end (or line end) inside the
+    section. Text that runs over a page break stays together; only the unfinished tail is
+    kept. Runs of blank lines become one empty line, so paragraph breaks survive.
+    """
+
+    def __init__(self, section_chars=DOC_SECTION_CHARS):
+        self.section_chars = max(1, section_chars)
+        self.lines = []  # (page number, line) not yet in a section
+
+    def add_page(self, page, text):
+        """Adds one page's raw text; returns the sections completed by it."""
+        for line in text.splitlines():
+            if line.strip():
+                self.lines.append((page, line))
+            elif self.lines and self.lines[-1][1]:
+                self.lines.append((page, ""))
+        return self._take(final=False)
+
+    def finish(self):
+        """Sections for the remaining text after the last page."""
+        return self._take(final=True)
+
+    def _take(self, final):
+        sections = []
+        while self.lines:
+            size, end, sentence_end = 0, None, None
+            for k, (_, line) in enumerate(self.lines):
+                size += len(line) + 1
+                if not line or line.rstrip().endswith(SENTENCE_ENDS):
+                    sentence_end = k + 1
+                if size >= self.section_chars:
+                    end = sentence_end or k + 1
+                    break
+            if end is None:
+                if not final:
+                    break
+                end = len(self.lines)
+            part, self.lines = self.lines[:end], self.lines[end:]
+            # A paragraph break at either end of a section is the section boundary itself
+            while part and not part[-1][1]:
+                part.pop()
+            while self.lines and not self.lines[0][1]:
+                self.lines.pop(0)
+            if not part:
+                continue
+            sections.append({
+                "type": "section",
+                "first_page": part[0][0],
+                "last_page": part[-1][0],
+                "raw": "\n".join(line for _, line in part),
+            })
+        return sections
+
+
+class DocumentJob:
+    """Page-by-page state of one document: lazy page reader, shared calibration, stitched text."""
+
+    def __init__(self, path, mode):
+        self.count, self.pages = open_document(path)
+        self.scanner = CalibratedScanner(mode, DOC_DRIFT_TOLERANCE, min_cells=DOC_MIN_CALIBRATION_CELLS)
+        self.stitcher = DocumentStitcher()
+        self.page = 0
+
+    def next_page(self):
+        """
+        Rasterizes and decodes the next page. Returns (page event, sections ready to refine),
+        or None after the last page.
+        """
+        if self.page >= self.count:
+            return None
+        img = next(self.pages, None)
+        self.page += 1
+        event = {"type": "page", "page": self.page, "pages": self.count}
+        if img is None:
+            event["error"] = "Unreadable page"
+            return event, []
+
+        result, raw_output, recalibrated = self.scanner.decode(img)
+        del img
+        event.update(raw=raw_output, cells=result.num_cells if result else 0, recalibrated=recalibrated)
+        sections = self.stitcher.add_page(self.page, raw_output) if raw_output else []
+        return event, sections
+
+    def finish(self):
+        return self.stitcher.finish()
+
+
+def refine_sections(sections, refiner, fast_path=None):
+    """
+    Fills in "ai", "refine_path" and "refined": confidence gate first, one refine_batch() call
+    for the rest. "refined" is False where the model was missing or failed and "ai" is the raw text.
+    """
+    checked = [fast_path.check(s["raw"]) if fast_path else (None, "model") for s in sections]
+    to_model = [k for k, (text, _) in enumerate(checked) if text is None]
+    refined = refiner.refine_batch([sections[k]["raw"] for k in to_model]) if to_model else []
+    outputs = [(text, True) for text, _ in checked]
+    for k, output in zip(to_model, refined):
+        outputs[k] = output
+    for section, (ai_output, ok), (_, path) in zip(sections, outputs, checked):
+        REFINE_PATH_TOTAL.inc(path=path)
+        section.update(ai=ai_output, refine_path=path, refined=ok)
+    return sections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a multi-page Braille PDF/TIFF page by page")
+    parser.add_argument("path", help="PDF, multi-page TIFF or single image")
+    parser.add_argument("--mode", choices=list(MODES), default="digital")
+    parser.add_argument("--refiner", choices=["real", "none"], default="real")
+    parser.add_argument("--lang", default="english", help="Translate refined sections to this language")
+    parser.add_argument("--output", help="Write the document text here, section by section")
+    parser.add_argument("--ndjson", action="store_true", help="Print every event as one JSON line")
+    args = parser.parse_args()
+
+    refiner = fast_path = None
+    if args.refiner == "real":
+        from model_server import build_refiner
+        from spellcheck import FastPath
+        refiner, fast_path = build_refiner(), FastPath()
+        fast_path.load()
+        refiner.load()
+
+    try:
+        job = DocumentJob(args.path, MODES[args.mode])
+    except (OSError, ValueError, RuntimeError) as e:
+        sys.exit(f"[-] {e}")
+    print(f"[*] {args.path}: {job.count} page(s)", file=sys.stderr)
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+
+    def emit(events):
+        sections = [e for e in events if e["type"] == "section"]
+        if refiner and sections:
+            refine_sections(sections, refiner, fast_path)
+            translations = refiner.translate_batch([s["ai"] for s in sections], target_lang=args.lang)
+            for section, translated in zip(sections, translations):
+                section["translated"] = translated
+        for event in events:
+            if event["type"] == "section" and out:
+                out.write(event.get("translated", event["raw"]) + "\n")
+                out.flush()
+            if args.ndjson:
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+
+    t0 = time.perf_counter()
+    while (step := job.next_page()) is not None:
+        event, sections = step
+        status = event.get("error") or f"{event['cells']} cells" + (", recalibrated" if event["recalibrated"] else "")
+        print(f"[+] Page {event['page']}/{job.count}: {status}", file=sys.stderr)
+        emit([event] + sections)
+    emit(job.finish() + [{"type": "done", "pages": job.count}])
+    if out:
+        out.close()
+    print(f"[+] Done: {job.count} page(s) in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# braile/backend/src/image_index.py
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Side of the grayscale thumbnail two scans are compared on
+THUMB_SIZE = 256
+# Largest mean difference (0-255) of any 8x8 thumbnail block between two copies of a scan.
+# Re-encoded copies stay around 2-6; a single added or missing dot on a page gives 10+.
+MAX_BLOCK_DIFF = 6.0
+BLOCK = 8
+# dHash bits two copies may differ in before the thumbnails are compared at all
+MAX_HASH_DISTANCE = 10
+
+
+def dhash(gray):
+    """64-bit difference hash: is each pixel of a 9x8 thumbnail brighter than its left neighbour."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class SimilarImageIndex:
+    """
+    Finds an earlier upload that is the same scan re-encoded or slightly rescaled. The dHash
+    only picks candidates; a match also needs the same aspect ratio and a block-wise
+    thumbnail difference small enough to rule out any changed dot. Bounded LRU, in memory.
+    """
+
+    def __init__(self, max_items=256, max_block_diff=MAX_BLOCK_DIFF):
+        self.max_items = max_items
+        self.max_block_diff = max_block_diff
+        self.lock = threading.Lock()
+        self.images = OrderedDict()  # digest -> (dhash, aspect, thumbnail)
+
+    @staticmethod
+    def fingerprint(img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        thumb = cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+        return dhash(thumb), img.shape[1] / img.shape[0], thumb
+
+    def add(self, digest, fingerprint):
+        with self.lock:
+            self.images[digest] = fingerprint
+            self.images.move_to_end(digest)
+            while len(self.images) > self.max_items:
+                self.images.popitem(last=False)
+
+    def find(self, fingerprint):
+        """Digest of a stored copy of the same scan, or None."""
+        h, aspect, thumb = fingerprint
+        with self.lock:
+            candidates = [
+                (digest, other) for digest, (other_h, other_aspect, other) in self.images.items()
+                if bin(h ^ other_h).count("1") <= MAX_HASH_DISTANCE and abs(aspect / other_aspect - 1) < 0.01
+            ]
+        for digest, other in candidates:
+            diff = cv2.absdiff(thumb, other).astype(np.float32)
+            blocks = cv2.resize(diff, (THUMB_SIZE // BLOCK, THUMB_SIZE // BLOCK), interpolation=cv2.INTER_AREA)
+            if float(blocks.max()) <= self.max_block_diff:
+                with self.lock:
+                    if digest in self.images:
+                        self.images.move_to_end(digest)
+                return digest
+        return None
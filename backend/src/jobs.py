@@ -0,0 +1,258 @@
+# braile/backend/src/jobs.py
+#
+# Asynchronous transcription jobs: POST /jobs stores the upload and answers with a job ID,
+# a few worker tasks run queued jobs by priority, and clients poll GET /jobs/{id} or follow
+# the server-sent events of GET /jobs/{id}/events. Job state lives in SQLite, so queued jobs
+# (and jobs interrupted by a shutdown) run again after a restart.
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from admission import Overloaded
+
+JOBS_DB_PATH = os.environ.get("BRAILLE_JOBS_DB", "data/jobs.sqlite3")
+# Uploads of queued jobs, removed once the job has finished
+JOBS_DIR = os.environ.get("BRAILLE_JOBS_DIR", "data/jobs")
+JOB_WORKERS = int(os.environ.get("BRAILLE_JOB_WORKERS", 2))
+# Queued jobs beyond this are refused with a 503
+JOB_MAX_QUEUED = int(os.environ.get("BRAILLE_JOB_MAX_QUEUED", 100))
+# Finished jobs are kept this long for GET /jobs/{id}
+JOB_RETENTION_HOURS = float(os.environ.get("BRAILLE_JOB_RETENTION_HOURS", 24))
+# Seconds between keep-alive comments on an idle event stream
+JOB_EVENTS_HEARTBEAT = 15
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobStore:
+    """SQLite table of jobs; params and results are stored as JSON."""
+
+    COLUMNS = ("id", "status", "priority", "created", "updated", "params", "input_path",
+               "progress", "result", "error")
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, "
+            "params TEXT NOT NULL, input_path TEXT, progress TEXT, result TEXT, error TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self.db.commit()
+
+    def create(self, job):
+        with self.lock:
+            self.db.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [self._encode(k, job.get(k)) for k in self.COLUMNS]
+            )
+            self.db.commit()
+
+    def update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        with self.lock:
+            self.db.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                [self._encode(k, v) for k, v in fields.items()] + [job_id]
+            )
+            self.db.commit()
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def unfinished(self):
+        """Queued and interrupted jobs, in the order they should run."""
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN (?, ?) "
+                "ORDER BY priority DESC, created", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def prune(self, before):
+        """Deletes jobs that finished before `before` (epoch seconds)."""
+        with self.lock:
+            self.db.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND updated < ?",
+                (*FINISHED, before)
+            )
+            self.db.commit()
+
+    @staticmethod
+    def _encode(column, value):
+        return json.dumps(value, ensure_ascii=False) if column in ("params", "result") and value is not None else value
+
+    def _decode(self, row):
+        job = dict(zip(self.COLUMNS, row))
+        for column in ("params", "result"):
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+
+class JobManager:
+    """
+    Bounded priority queue (higher priority first, then oldest) drained by `workers` asyncio
+    tasks. `run_job(job, progress)` does the work and returns the result; the blocking parts
+    run on the CV/model pools it uses, so the workers only bound how many jobs are in flight.
+    """
+
+    def __init__(self, store, run_job, workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED,
+                 retention_hours=JOB_RETENTION_HOURS, retry_after=1):
+        self.store = store
+        self.run_job = run_job
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.retention = retention_hours * 3600
+        self.retry_after = retry_after
+        self.heap = []  # (-priority, created, seq, job id)
+        self.seq = itertools.count()
+        self.queued = set()
+        self.running = {}  # job id -> asyncio task
+        self.watchers = {}  # job id -> set of asyncio queues
+        self.available = None
+        self.tasks = []
+        self.stopping = False
+
+    async def start(self):
+        self.available = asyncio.Event()
+        restored = self.store.unfinished()
+        for job in restored:
+            if job["status"] == RUNNING:
+                self.store.update(job["id"], status=QUEUED, progress=None)
+            self._enqueue(job)
+        if restored:
+            print(f"[*] Restored {len(restored)} unfinished job(s)")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stops the workers; interrupted jobs stay queued in the store and run after a restart."""
+        self.stopping = True
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def submit(self, params, input_path, priority=0):
+        if len(self.queued) >= self.max_queued:
+            raise Overloaded("jobs", self.retry_after)
+        now = time.time()
+        job = {"id": uuid.uuid4().hex, "status": QUEUED, "priority": priority, "created": now,
+               "updated": now, "params": params, "input_path": input_path}
+        self.store.create(job)
+        self._enqueue(job)
+        return self.get(job["id"])
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        if job is not None and job["status"] == QUEUED:
+            job["position"] = self._position(job_id)
+        return job
+
+    def cancel(self, job_id):
+        """Cancels a queued or running job; returns the job (None if unknown)."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        if job_id in self.running:
+            self.running[job_id].cancel()  # the worker records the cancellation
+        else:
+            self.queued.discard(job_id)
+            self._finish(job, CANCELLED)
+        return self.store.get(job_id)
+
+    async def watch(self, job_id):
+        """
+        Yields the job now and after every change until it has finished; None after
+        JOB_EVENTS_HEARTBEAT idle seconds, so the caller can keep the connection alive.
+        """
+        updates = asyncio.Queue()
+        self.watchers.setdefault(job_id, set()).add(updates)
+        try:
+            job = self.get(job_id)
+            if job is None:
+                return
+            yield job
+            while job["status"] not in FINISHED:
+                try:
+                    job = await asyncio.wait_for(updates.get(), JOB_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield job
+        finally:
+            watchers = self.watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(updates)
+                if not watchers:
+                    del self.watchers[job_id]
+
+    def _enqueue(self, job):
+        heapq.heappush(self.heap, (-job["priority"], job["created"], next(self.seq), job["id"]))
+        self.queued.add(job["id"])
+        self.available.set()
+
+    def _position(self, job_id):
+        ahead = sorted(entry for entry in self.heap if entry[3] in self.queued)
+        return next((k for k, entry in enumerate(ahead) if entry[3] == job_id), None)
+
+    def _update(self, job_id, **fields):
+        self.store.update(job_id, **fields)
+        if self.watchers.get(job_id):
+            job = self.get(job_id)
+            for updates in self.watchers[job_id]:
+                updates.put_nowait(job)
+
+    def _finish(self, job, status, result=None, error=None):
+        self._update(job["id"], status=status, result=result, error=error, progress=None)
+        if job.get("input_path"):
+            try:
+                os.remove(job["input_path"])
+            except OSError:
+                pass
+        self.store.prune(time.time() - self.retention)
+
+    async def _next_job(self):
+        while True:
+            while self.heap:
+                _, _, _, job_id = heapq.heappop(self.heap)
+                if job_id in self.queued:
+                    self.queued.discard(job_id)
+                    return self.store.get(job_id)
+            self.available.clear()
+            await self.available.wait()
+
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            if job is None or job["status"] != QUEUED:
+                continue
+            self._update(job["id"], status=RUNNING)
+            task = asyncio.create_task(self.run_job(job, lambda step, job_id=job["id"]: self._update(job_id, progress=step)))
+            self.running[job["id"]] = task
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if self.stopping:
+                    task.cancel()
+                    raise
+                self._finish(job, CANCELLED)
+            except Exception as e:
+                self._finish(job, FAILED, error=str(e) or type(e).__name__)
+            else:
+                self._finish(job, DONE, result=result)
+            finally:
+                self.running.pop(job["id"], None)
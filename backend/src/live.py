@@ -0,0 +1,89 @@
+# braile/backend/src/live.py
+#
+# Live camera mode: a phone streams frames of one page over a WebSocket. Only the newest
+# frame is decoded, the dot-pitch calibration carries over between frames until the dot
+# size drifts, and the text is handed to the refiner once it has stopped changing.
+
+import asyncio
+import os
+from collections import deque
+
+from pipeline import read_scan, CalibratedScanner
+from metrics import LIVE_FRAMES_TOTAL
+
+# Identical raw decodes in a row before the text is refined
+LIVE_STABLE_FRAMES = int(os.environ.get("BRAILLE_LIVE_STABLE_FRAMES", 3))
+# Relative dot-size change (camera moved closer/further) that invalidates the calibration
+LIVE_DRIFT_TOLERANCE = float(os.environ.get("BRAILLE_LIVE_DRIFT", 0.15))
+# Re-measure the pitch at least this often, even without drift
+LIVE_CALIBRATION_FRAMES = int(os.environ.get("BRAILLE_LIVE_CALIBRATION_FRAMES", 30))
+
+
+class LatestFrame:
+    """One-slot mailbox: a frame that arrives before the previous one was taken replaces it."""
+
+    def __init__(self):
+        self.frame = None
+        self.dropped = 0
+        self.closed = False
+        self.event = asyncio.Event()
+
+    def put(self, frame):
+        if self.frame is not None:
+            self.dropped += 1
+            LIVE_FRAMES_TOTAL.inc(outcome="dropped")
+        self.frame = frame
+        self.event.set()
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+    async def get(self):
+        """Waits for the newest frame; None once the connection is closed."""
+        await self.event.wait()
+        self.event.clear()
+        if self.closed:
+            return None
+        frame, self.frame = self.frame, None
+        return frame
+
+
+class LiveSession:
+    """Decoding state of one live connection. process_frame() is blocking and not reentrant."""
+
+    def __init__(self, mode):
+        self.scanner = CalibratedScanner(mode, LIVE_DRIFT_TOLERANCE, LIVE_CALIBRATION_FRAMES)
+        self.frames = 0
+        self.recent = deque(maxlen=max(1, LIVE_STABLE_FRAMES))
+        self.refined_raw = None
+
+    def process_frame(self, contents):
+        """Decodes one JPEG/PNG frame into the message sent back to the client."""
+        self.frames += 1
+        img = read_scan(contents)
+        if img is None:
+            return {"type": "frame", "frame": self.frames, "error": "Invalid Image"}
+
+        result, raw_output, recalibrated = self.scanner.decode(img)
+        if result is None:
+            self.recent.clear()
+            return {"type": "frame", "frame": self.frames, "raw": None, "cells": 0, "rects": [],
+                    "stable": False, "recalibrated": False}
+
+        # Stable once the same text was read LIVE_STABLE_FRAMES times in a row
+        self.recent.append(raw_output)
+        stable = len(self.recent) == self.recent.maxlen and len(set(self.recent)) == 1
+        return {
+            "type": "frame",
+            "frame": self.frames,
+            "raw": raw_output,
+            "cells": result.num_cells,
+            "rects": result.rects.tolist(),
+            "stable": stable,
+            "recalibrated": recalibrated,
+        }
+
+    def should_refine(self, message):
+        """True for a stable decode that has not been refined yet."""
+        return bool(message.get("stable")) and message["raw"] != self.refined_raw
@@ -1,23 +1,104 @@
 # braile/backend/src/main.py
 
-import os
 import time
+_t_import = time.perf_counter()
+
+import os
 import uvicorn
-import cv2
 import numpy as np
 import base64
-import io
-from fastapi import FastAPI, UploadFile, File, Form
+import asyncio
+import json
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse, Response
 from pydantic import BaseModel
-from gtts import gTTS
+from typing import Optional
 
-from preprocess import clean_image
-from detector import detect_dots, group_dots_into_lines
 from translator import BrailleTranslator
-from ai_refiner import AIRefiner
+from ai_refiner import CACHE_DB_PATH
+from model_server import build_refiner
+from pipeline import read_scan, decode_scan, render_debug, encode_jpeg, process_scan_bytes, PHOTO_MODE
+from batcher import RefineBatcher, TranslateBatcher
+from deadline import GenerationPlanner, estimate_tokens, RAW
+from admission import WorkLimiter, Overloaded
+from spellcheck import FastPath
+from translation_backends import lang_code
+from tts_engines import build_tts_engine, AUDIO_MEDIA_TYPES
+from cache import ResultCache, AudioCache, ScanStore, make_key, normalize_text
+from image_index import SimilarImageIndex
+from archive import ScanArchive, API_ARCHIVE_ENABLED, content_hash
+from braille_stream import BrailleStreamDecoder, is_brf, CHUNK_SIZE
+from live import LiveSession, LatestFrame
+from document import DocumentJob
+from jobs import JobStore, JobManager, JOBS_DIR
+import metrics
+from metrics import stage, record_stage, record_scan, PAYLOAD_BYTES, REFINE_PATH_TOTAL, REFINE_STRATEGY_TOTAL, LIVE_FRAMES_TOTAL, SCAN_CACHE_TOTAL
+
+print(f"[*] Server imports done in {time.perf_counter() - _t_import:.2f}s")
+
+# Worker processes for the OpenCV stages of /translate-batch
+BATCH_WORKERS = int(os.environ.get("BRAILLE_BATCH_WORKERS", os.cpu_count() or 1))
+_scan_pool = None
+
+def get_scan_pool():
+    global _scan_pool
+    if _scan_pool is None:
+        _scan_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+    return _scan_pool
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm the model in the background; model-free endpoints serve right away
+    warmup = asyncio.create_task(model_limiter.call(warm_up))
+    await jobs.start()
+    sweeper = asyncio.create_task(sweep_audio())
+    yield
+    sweeper.cancel()
+    await jobs.stop()
+    warmup.cancel()
+    await refine_batcher.close()
+    await translate_batcher.close()
+    cv_limiter.shutdown()
+    model_limiter.shutdown()
+    if archive is not None:
+        archive.close()
+    if _scan_pool is not None:
+        _scan_pool.shutdown(cancel_futures=True)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Request latency per route, plus a Server-Timing header with this request's stage timings."""
+    if not metrics.METRICS_ENABLED:
+        return await call_next(request)
+    timings = {}
+    metrics.REQUEST_TIMINGS.set(timings)
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+
+    route = request.scope.get("route")
+    path = route.path if route is not None else "other"
+    metrics.REQUEST_SECONDS.observe(elapsed, path=path)
+    metrics.REQUESTS_TOTAL.inc(path=path, status=str(response.status_code))
+    if metrics.SERVER_TIMING_ENABLED and timings:
+        response.headers["Server-Timing"] = metrics.server_timing_header({**timings, "total": elapsed})
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,13 +108,200 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-DATA_INPUT_DIR = "data/input"
-DATA_OUTPUT_DIR = "data/output"
-for folder in[DATA_INPUT_DIR, DATA_OUTPUT_DIR]:
-    os.makedirs(folder, exist_ok=True)
+# Uploads are kept in memory for a while so GET /results/{id}/image can draw the debug
+# overlay only when a client wants it; with BRAILLE_API_ARCHIVE=1 they are also archived
+# (data/input) by a background writer
+archive = ScanArchive() if API_ARCHIVE_ENABLED else None
+RESULT_STORE_MB = float(os.environ.get("BRAILLE_RESULT_STORE_MB", 128))
+scan_store = ScanStore(int(RESULT_STORE_MB * 1024 * 1024))
+
+# Whole /translate results by upload hash, mode and language, so repeat uploads skip the
+# pipeline. The optional similar-image tier also matches re-encoded copies of a scan.
+SCAN_CACHE_TTL_HOURS = float(os.environ.get("BRAILLE_SCAN_CACHE_TTL_HOURS", 24 * 7))
+SCAN_CACHE_SIMILAR = os.environ.get("BRAILLE_SCAN_CACHE_SIMILAR", "0") == "1"
+scan_cache = ResultCache(CACHE_DB_PATH, "scan_cache", max_memory_items=256, max_disk_items=20000,
+                         ttl=SCAN_CACHE_TTL_HOURS * 3600)
+similar_images = SimilarImageIndex() if SCAN_CACHE_SIMILAR else None
 
 translator = BrailleTranslator()
-refiner = AIRefiner()
+refiner = build_refiner()
+fast_path = FastPath()
+
+# Blocking work runs off the event loop. OpenCV stages and model calls (T5,
+# translation, TTS) get separate pools; requests beyond the limits get a fast 503.
+RETRY_AFTER_SECONDS = int(os.environ.get("BRAILLE_RETRY_AFTER", 1))
+CV_WORKERS = int(os.environ.get("BRAILLE_CV_WORKERS", os.cpu_count() or 1))
+CV_MAX_PENDING = int(os.environ.get("BRAILLE_CV_MAX_PENDING", CV_WORKERS * 2))
+MODEL_WORKERS = int(os.environ.get("BRAILLE_MODEL_WORKERS", 2))
+cv_limiter = WorkLimiter("cv", CV_WORKERS, CV_MAX_PENDING, RETRY_AFTER_SECONDS)
+
+# Concurrent fix_text calls are merged into one refine_batch call (refined in length buckets)
+REFINE_MAX_BATCH = int(os.environ.get("BRAILLE_REFINE_MAX_BATCH", 8))
+REFINE_MAX_WAIT_MS = int(os.environ.get("BRAILLE_REFINE_MAX_WAIT_MS", 20))
+MODEL_MAX_PENDING = int(os.environ.get("BRAILLE_MODEL_MAX_PENDING", REFINE_MAX_BATCH * 2))
+model_limiter = WorkLimiter("model", MODEL_WORKERS, MODEL_MAX_PENDING, RETRY_AFTER_SECONDS)
+# Default refinement latency budget of a request in ms (0: none, always beam search);
+# clients set their own with a budget_ms field or the X-Latency-Budget-Ms header
+REFINE_BUDGET_MS = int(os.environ.get("BRAILLE_REFINE_BUDGET_MS", 10000))
+planner = GenerationPlanner()
+refine_batcher = RefineBatcher(refiner, max_batch_size=REFINE_MAX_BATCH, max_wait_ms=REFINE_MAX_WAIT_MS,
+                               executor=model_limiter.executor, planner=planner)
+# Concurrent translations to the same language share one backend call
+TRANSLATE_MAX_BATCH = int(os.environ.get("BRAILLE_TRANSLATE_MAX_BATCH", 16))
+TRANSLATE_MAX_WAIT_MS = int(os.environ.get("BRAILLE_TRANSLATE_MAX_WAIT_MS", 20))
+translate_batcher = TranslateBatcher(refiner, max_batch_size=TRANSLATE_MAX_BATCH,
+                                     max_wait_ms=TRANSLATE_MAX_WAIT_MS, executor=model_limiter.executor)
+
+def warm_up():
+    fast_path.load()
+    refiner.load()
+
+def request_deadline(budget_ms, started):
+    """Monotonic deadline for a budget in ms (None: the server default); None without a budget."""
+    budget_ms = REFINE_BUDGET_MS if budget_ms is None else budget_ms
+    return started + budget_ms / 1000 if budget_ms > 0 else None
+
+async def refine_text(raw_output, deadline=None):
+    """
+    Confidence gate first; only low-confidence text goes through the T5 batcher, with the
+    best generation strategy that still finishes by `deadline`. Returns the response fields;
+    "refined" is True only if the fast path or the model produced the "ai" text.
+    """
+    t0 = time.perf_counter()
+    with stage("refine"):
+        checked, path = fast_path.check(raw_output)
+        REFINE_PATH_TOTAL.inc(path=path)
+        if checked is not None:
+            ai_output, batch_size, strategy, ok = checked, 0, None, True
+        else:
+            tokens = estimate_tokens(raw_output)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            strategy = planner.choose(tokens, remaining)
+            REFINE_STRATEGY_TOTAL.inc(strategy=strategy)
+            if strategy == RAW:
+                ai_output, batch_size, ok = raw_output, 0, False
+            else:
+                with planner.queued(tokens):
+                    ai_output, batch_size, ok, _ = await refine_batcher.fix_text(raw_output, strategy)
+    return {"ai": ai_output, "refine_path": path, "batch_size": batch_size, "refine_strategy": strategy,
+            "refined": ok, "refine_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+async def translate_text(text, target_lang):
+    """English passes straight through; other languages go through the translation batcher."""
+    if lang_code(target_lang) == "en":
+        return text
+    with stage("translate"):
+        return await translate_batcher.translate_text(text, target_lang)
+
+def require_model():
+    """Model endpoints answer 503 until the background warm-up has finished."""
+    if not refiner.ready.is_set():
+        raise Overloaded("model warm-up", RETRY_AFTER_SECONDS)
+
+# Spoken audio is cached on disk by (text, lang, engine) and served as a file or a stream
+AUDIO_CACHE_DIR = os.environ.get("BRAILLE_AUDIO_CACHE_DIR", "data/audio_cache")
+AUDIO_CACHE_MB = float(os.environ.get("BRAILLE_AUDIO_CACHE_MB", 256))
+# Texts requested through /generate-audio, kept so /audio/{key} can (re)synthesize them
+AUDIO_MAX_PENDING = 256
+# A started synthesis nobody fetched is stopped after this long (its text is kept)
+AUDIO_PENDING_TTL = float(os.environ.get("BRAILLE_AUDIO_PENDING_TTL", 60))
+audio_cache = AudioCache(AUDIO_CACHE_DIR, int(AUDIO_CACHE_MB * 1024 * 1024))
+tts_engine = build_tts_engine()
+pending_audio = OrderedDict()  # key -> (text, lang, started synthesis or None, started at)
+
+def audio_key(text, lang):
+    return make_key("tts", tts_engine.name, lang, normalize_text(text))
+
+def start_speech(key, text, lang):
+    """Starts synthesis into the audio cache; returns (first chunk, iterator of the rest)."""
+    with stage("tts"):
+        chunks = audio_cache.fill(key, tts_engine.ext, tts_engine.stream(text, lang))
+        first = next(chunks, b"")
+    return first, chunks
+
+def remember_audio(key, text, lang, started=None):
+    previous = pending_audio.pop(key, None)
+    if previous is not None and previous[2] is not None:
+        previous[2][1].close()
+    pending_audio[key] = (text, lang, started, time.monotonic())
+    while len(pending_audio) > AUDIO_MAX_PENDING:
+        _, (_, _, abandoned, _) = pending_audio.popitem(last=False)
+        if abandoned is not None:
+            abandoned[1].close()
+    expire_audio()
+
+async def sweep_audio():
+    """Expires unfetched syntheses while no audio requests come in."""
+    while True:
+        await asyncio.sleep(AUDIO_PENDING_TTL)
+        expire_audio()
+
+def expire_audio():
+    """Stops syntheses (and their engine processes or streams) started over AUDIO_PENDING_TTL ago."""
+    cutoff = time.monotonic() - AUDIO_PENDING_TTL
+    for key, (text, lang, started, started_at) in list(pending_audio.items()):
+        if started is not None and started_at < cutoff:
+            started[1].close()
+            pending_audio[key] = (text, lang, None, started_at)
+
+def keep_scan(contents, mode, rects, digest=None):
+    """Remembers the upload for the debug image (and archives it if enabled); returns the result ID."""
+    digest = digest or content_hash(contents)
+    if archive is not None:
+        archive.add(contents, digest=digest)
+    result_id = make_key("scan", digest, mode)
+    scan_store.put(result_id, contents, rects)
+    return result_id
+
+def render_debug_jpeg(contents, rects):
+    """Debug image of a stored scan, JPEG-encoded."""
+    buffer = encode_jpeg(render_debug(read_scan(contents), rects))
+    PAYLOAD_BYTES.observe(len(buffer), kind="debug_image")
+    return buffer
+
+def result_key(digest, mode, target_lang):
+    """Scan-cache key: the upload, how it is read, and the models that produce the text."""
+    return make_key("result", digest, mode, lang_code(target_lang), *refiner.model_key())
+
+def store_result(key, result, digest, fingerprint=None):
+    """Caches a transcription (a SQLite write: called off the event loop) and indexes its scan."""
+    scan_cache.put(key, json.dumps(result, ensure_ascii=False))
+    if fingerprint is not None:
+        similar_images.add(digest, fingerprint)
+
+def find_similar(img_cv):
+    fingerprint = SimilarImageIndex.fingerprint(img_cv)
+    return fingerprint, similar_images.find(fingerprint)
+
+def scale_rects(hit, shape):
+    """Cell rects of a cached result, moved onto a rescaled copy of its scan."""
+    sy, sx = shape[0] / hit["size"][0], shape[1] / hit["size"][1]
+    return (np.asarray(hit["rects"]) * [sx, sy, sx, sy]).round().astype(int).tolist()
+
+def image_fields(request, result_id, image=None):
+    """The debug image inline (when asked for) and always by URL."""
+    return {
+        "result_id": result_id,
+        "image": f"data:image/jpeg;base64,{base64.b64encode(image).decode('utf-8')}" if image else None,
+        "image_url": str(request.url_for("result_image_endpoint", result_id=result_id))
+    }
+
+def cache_metrics():
+    """Exposes the refine/translate cache counters at scrape time."""
+    lines = []
+    kinds = {"memory_hits": "counter", "disk_hits": "counter", "misses": "counter",
+             "memory_evictions": "counter", "disk_evictions": "counter",
+             "memory_items": "gauge", "disk_items": "gauge"}
+    caches = {"refine": refiner.refine_cache, "translate": refiner.translate_cache, "scan": scan_cache,
+              "audio": audio_cache}
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    for key, kind in kinds.items():
+        name = f"braille_cache_{key}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {name} Result cache {key.replace('_', ' ')}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{cache="{cache}"}} {s[key]}' for cache, s in stats.items() if key in s]
+    return lines
+
+metrics.register_collector(cache_metrics)
 
 class TextRequest(BaseModel):
     text: str
@@ -41,24 +309,96 @@ class TextRequest(BaseModel):
 class BrailleTextRequest(BaseModel):
     braille_text: str
     target_lang: str = "english"
+    budget_ms: Optional[int] = None
 
 class AudioRequest(BaseModel):
     text: str
     lang: str
 
-# --- NEW: Cloud Native TTS Generator ---
 @app.post("/generate-audio")
-async def generate_audio_endpoint(req: AudioRequest):
-    try:
-        # Fetches native voice from Google Cloud
-        tts = gTTS(text=req.text, lang=req.lang)
-        fp = io.BytesIO()
-        tts.write_to_fp(fp)
-        fp.seek(0)
-        audio_base64 = base64.b64encode(fp.read()).decode('utf-8')
-        return {"audio": f"data:audio/mp3;base64,{audio_base64}"}
-    except Exception as e:
-        return {"error": str(e)}
+async def generate_audio_endpoint(req: AudioRequest, request: Request):
+    """
+    Returns {"audio": URL} for the spoken text. Uncached text starts synthesizing here, so
+    engine errors are still reported by this call; GET /audio/{key} streams the rest.
+    """
+    if tts_engine is None:
+        return {"error": "No text-to-speech engine available"}
+    key = audio_key(req.text, req.lang)
+    if key not in audio_cache:
+        try:
+            started = await model_limiter.run(start_speech, key, req.text, req.lang)
+        except Overloaded:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+        remember_audio(key, req.text, req.lang, started)
+    return {"audio": str(request.url_for("audio_endpoint", key=key))}
+
+@app.get("/audio/{key}")
+async def audio_endpoint(key: str):
+    """Cached audio as a file (with Range support), otherwise streamed while it is synthesized."""
+    path = audio_cache.get(key)
+    if path is not None:
+        ext = path.rsplit(".", 1)[-1]
+        return FileResponse(path, media_type=AUDIO_MEDIA_TYPES.get(ext, "application/octet-stream"))
+
+    expire_audio()
+    pending = pending_audio.get(key)
+    if pending is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired audio"})
+    text, lang, started, started_at = pending
+    if started is not None:
+        # Hand the running synthesis to this response; a repeated request synthesizes anew
+        pending_audio[key] = (text, lang, None, started_at)
+    else:
+        try:
+            started = await model_limiter.run(start_speech, key, text, lang)
+        except Overloaded:
+            raise
+        except Exception as e:
+            return JSONResponse(status_code=502, content={"error": str(e)})
+
+    first, rest = started
+
+    async def stream():
+        try:
+            yield first
+            while (chunk := await model_limiter.call(next, rest, None)) is not None:
+                yield chunk
+        finally:
+            try:
+                rest.close()
+            except ValueError:
+                pass  # still running in a worker after a disconnect; it finishes into the cache
+
+    return StreamingResponse(stream(), media_type=tts_engine.media_type)
+
+@app.get("/healthz")
+async def healthz_endpoint():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz_endpoint():
+    # With a model server, status and cache counters are socket round trips: off the event loop
+    status = {**await asyncio.to_thread(refiner.status), "refine_planner": planner.stats()}
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    return status
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(await asyncio.to_thread(metrics.render), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache-stats")
+async def cache_stats_endpoint():
+    refine, translate, scan = await asyncio.to_thread(
+        lambda: (refiner.refine_cache.stats(), refiner.translate_cache.stats(), scan_cache.stats()))
+    return {
+        "refine": refine,
+        "translate": translate,
+        "scan": scan,
+        "audio": audio_cache.stats()
+    }
 
 @app.post("/generate-braille")
 async def generate_braille_endpoint(req: TextRequest):
@@ -66,122 +406,482 @@ async def generate_braille_endpoint(req: TextRequest):
     return {"braille": braille_output}
 
 @app.post("/translate-braille-text")
-async def translate_braille_text_endpoint(req: BrailleTextRequest):
-    raw_output = translator.braille_to_text(req.braille_text)
-    raw_output = translator.post_process_text(raw_output)
-    ai_output = refiner.fix_text(raw_output)
-    translated_output = refiner.translate_text(ai_output, target_lang=req.target_lang)
+async def translate_braille_text_endpoint(req: BrailleTextRequest,
+                                          x_latency_budget_ms: Optional[int] = Header(None)):
+    deadline = request_deadline(req.budget_ms if req.budget_ms is not None else x_latency_budget_ms,
+                                time.monotonic())
+    require_model()
+    with stage("braille_to_text"):
+        raw_output = translator.braille_to_text(req.braille_text)
+        raw_output = translator.post_process_text(raw_output)
+    async with model_limiter.admit():
+        refined = await refine_text(raw_output, deadline)
+        translated_output = await translate_text(refined["ai"], req.target_lang)
     
+    return {
+        "raw": raw_output,
+        "ai": refined["ai"],
+        "translated": translated_output,
+        **{k: v for k, v in refined.items() if k != "ai"}
+    }
+
+@app.post("/translate-braille-file")
+async def translate_braille_file_endpoint(file: UploadFile = File(...)):
+    """Streams the raw decoded text of a large .brf / Unicode Braille upload, chunk by chunk."""
+    async def decode_chunks():
+        decoder = None
+        while True:
+            data = await file.read(CHUNK_SIZE)
+            if decoder is None:
+                sample = data[:4096].decode("utf-8", "ignore")
+                decoder = BrailleStreamDecoder(translator, brf=is_brf(sample, file.filename or ""))
+            text = decoder.feed_bytes(data, final=not data)
+            if text:
+                yield text
+            if not data:
+                break
+
+    return StreamingResponse(decode_chunks(), media_type="text/plain; charset=utf-8")
+
+async def transcribe(contents, mode, target_lang, include_image=False, progress=None, deadline=None):
+    """
+    The /translate pipeline for one upload: result cache, decode, refine, translate. Returns
+    the response fields; "result_id" and "image" (JPEG bytes or None) are turned into the
+    image fields by the caller. `progress(step)` is told when each step starts; `deadline`
+    (monotonic seconds) picks the refinement strategy.
+    """
+    report = progress or (lambda step: None)
+    PAYLOAD_BYTES.observe(len(contents), kind="upload")
+
+    # 1. Whole-result cache: the same bytes were read in this mode and language before.
+    #    Cache reads and writes go to SQLite, so they run off the event loop.
+    digest = content_hash(contents)
+    key = result_key(digest, mode, target_lang)
+    cached = await asyncio.to_thread(scan_cache.get, key)
+    hit = json.loads(cached) if cached is not None else None
+    cache_result = "exact" if hit is not None else "miss"
+
+    # 2. Decode unless cached; a hit only needs the image for an inline debug overlay
+    fingerprint = image = None
+    if hit is None or include_image:
+        report("decode")
+        scan_stats = {}
+        async with cv_limiter.admit():
+            img_cv = await cv_limiter.call(read_scan, contents)
+            if img_cv is None: return {"error": "Invalid Image"}
+            size = img_cv.shape[:2]
+            if hit is None and similar_images is not None:
+                fingerprint, similar = await cv_limiter.call(find_similar, img_cv)
+                cached = None
+                if similar:
+                    cached = await cv_limiter.call(scan_cache.get, result_key(similar, mode, target_lang))
+                if cached is not None:
+                    hit, cache_result = json.loads(cached), "similar"
+                    if hit["raw"] is not None:
+                        hit["rects"] = scale_rects(hit, size)
+                    hit["size"] = size
+                    await cv_limiter.call(store_result, key, hit, digest)
+            if hit is None:
+                raw_output, rects = await cv_limiter.call(decode_scan, img_cv, mode, scan_stats)
+            else:
+                raw_output, rects = hit["raw"], hit.get("rects")
+            if include_image and raw_output is not None:
+                image = await cv_limiter.call(lambda: encode_jpeg(render_debug(img_cv, rects)))
+                PAYLOAD_BYTES.observe(len(image), kind="debug_image")
+        del img_cv
+        record_scan(scan_stats)
+    else:
+        raw_output, rects = hit["raw"], hit.get("rects")
+    SCAN_CACHE_TOTAL.inc(result=cache_result)
+
+    if raw_output is None:
+        if hit is None:
+            await asyncio.to_thread(store_result, key, {"raw": None, "size": size}, digest, fingerprint)
+        return {"raw": "No dots found", "ai": "No dots found", "translated": "No dots found", "image": None,
+                "result_cache": cache_result}
+    result_id = keep_scan(contents, mode, rects, digest)
+
+    if hit is not None:
+        return {
+            "raw": raw_output,
+            "ai": hit["ai"],
+            "translated": hit["translated"],
+            "result_id": result_id,
+            "image": image,
+            "refine_path": hit["refine_path"],
+            "batch_size": 0,
+            "refine_strategy": hit.get("refine_strategy"),
+            "refined": True,
+            "refine_ms": 0,
+            "result_cache": cache_result
+        }
+
+    # 3. Refine and translate
+    report("refine")
+    async with model_limiter.admit():
+        refined = await refine_text(raw_output, deadline)
+        report("translate")
+        ai_output = refined["ai"]
+        translated_output = await translate_text(ai_output, target_lang)
+
+    # A translation that failed passes the English through, a failed refinement the raw text,
+    # and a budget that ruled out beam search gives a weaker refinement; none of them is cached
+    translated = lang_code(target_lang) == "en" or translated_output != ai_output
+    if translated and refined["refined"] and refined["refine_strategy"] in (None, "beam"):
+        await asyncio.to_thread(store_result, key, {
+            "raw": raw_output, "ai": ai_output, "translated": translated_output,
+            "refine_path": refined["refine_path"], "refine_strategy": refined["refine_strategy"],
+            "rects": rects.tolist(), "size": size
+        }, digest, fingerprint)
+
     return {
         "raw": raw_output,
         "ai": ai_output,
-        "translated": translated_output
+        "translated": translated_output,
+        "result_id": result_id,
+        "image": image,
+        **{k: v for k, v in refined.items() if k != "ai"},
+        "result_cache": cache_result
     }
 
+def with_image_fields(request, result):
+    """Replaces transcribe()'s result_id/image with the public image fields."""
+    if "result_id" not in result:
+        return result
+    result = dict(result)
+    fields = image_fields(request, result.pop("result_id"), result.pop("image"))
+    return {**result, **fields}
+
 @app.post("/translate")
 async def translate_endpoint(
+    request: Request,
     file: UploadFile = File(...), 
     mode: str = Form(...),
-    target_lang: str = Form("english")
+    target_lang: str = Form("english"),
+    include_image: bool = Form(False),
+    budget_ms: Optional[int] = Form(None),
+    x_latency_budget_ms: Optional[int] = Header(None)
 ):
+    """
+    Decodes, refines and translates one scan. The debug image is inlined only with
+    include_image=true; otherwise clients fetch it from image_url when they show it.
+    budget_ms (or X-Latency-Budget-Ms) bounds the request time: refinement falls back to
+    greedy search, or to the raw decode, when beam search would not finish in time.
+    """
+    deadline = request_deadline(budget_ms if budget_ms is not None else x_latency_budget_ms, time.monotonic())
+    require_model()
     contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    img_cv = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img_cv is None: return {"error": "Invalid Image"}
-    
-    debug_img = img_cv.copy()
-    is_photo = (mode == "Real Photo (Embossed)")
-    thresh = clean_image(img_cv, is_photo)
-    dots = detect_dots(thresh)
-    
-    if not dots:
-        return {"raw": "No dots found", "ai": "No dots found", "translated": "No dots found", "image": None}
+    return with_image_fields(request, await transcribe(contents, mode, target_lang, include_image,
+                                                       deadline=deadline))
 
-    lines = group_dots_into_lines(dots)
-    
-    avg_dot_w = np.median([d[2] for d in dots])
-    dx_list, dy_list = [],[]
-    for line in lines:
-        xs = sorted([d[4] for d in line])
-        for i in range(1, len(xs)):
-            dx = xs[i] - xs[i-1]
-            if dx > avg_dot_w * 0.5: dx_list.append(dx)
-        ys = sorted([d[5] for d in line])
-        for i in range(1, len(ys)):
-            dy = ys[i] - ys[i-1]
-            if dy > avg_dot_w * 0.5: dy_list.append(dy)
-
-    S_y = np.percentile(dy_list, 25) if dy_list else (np.percentile(dx_list, 10) if dx_list else avg_dot_w * 2.5)
-    if dx_list:
-        raw_Sx = np.percentile(dx_list, 10)
-        S_x = min(raw_Sx, S_y * 1.3) if dy_list else raw_Sx
-    else: S_x = S_y
-
-    S_x = max(S_x, avg_dot_w * 1.2)
-    S_y = max(S_y, avg_dot_w * 1.2)
-
-    final_text = ""
-    for line in lines:
-        if not line: continue
-        line.sort(key=lambda d: d[4])
-        line_top_cy = min(d[5] for d in line) 
-        
-        clusters =[]
-        curr_cluster = [line[0]]
-        for dot in line[1:]:
-            if (dot[4] - curr_cluster[-1][4]) > S_x * 1.4:
-                clusters.append(curr_cluster)
-                curr_cluster = [dot]
-            else: curr_cluster.append(dot)
-        if curr_cluster: clusters.append(curr_cluster)
-            
-        strides =[]
-        for i in range(1, len(clusters)):
-            d_cx = clusters[i][0][4] - clusters[i-1][-1][4]
-            if S_x * 1.0 < d_cx < S_x * 3.5: strides.append(clusters[i][0][4] - clusters[i-1][0][4])
-        Cell_Stride = np.median(strides) if strides else S_x * 2.6
-        
-        expected_anchor_x = clusters[0][0][4]
-        if len(clusters[0]) > 0:
-            first_w = max(d[4] for d in clusters[0]) - min(d[4] for d in clusters[0])
-            if first_w < S_x * 0.5 and len(clusters) > 1:
-                if (clusters[1][0][4] - clusters[0][0][4]) < Cell_Stride * 0.8:
-                    expected_anchor_x = clusters[0][0][4] - S_x
-                    
-        line_text = ""
-        for cluster in clusters:
-            min_cx = min(d[4] for d in cluster)
-            shift = min_cx - expected_anchor_x
-            num_strides = max(0, round(shift / Cell_Stride))
-            current_cell_anchor_x = expected_anchor_x + num_strides * Cell_Stride
-            
-            if abs(min_cx - (current_cell_anchor_x + S_x)) < abs(min_cx - current_cell_anchor_x):
-                actual_cell_anchor_x = min_cx - S_x
-            else: actual_cell_anchor_x = min_cx
-                
-            char, rect = translator.decode_cell(cluster, actual_cell_anchor_x, S_x, S_y, line_top_cy)
-            if num_strides > 1 and len(line_text) > 0: line_text += " " * (num_strides - 1)
-                
-            line_text += char
-            cv2.rectangle(debug_img, (rect[0], rect[1]), (rect[2], rect[3]), (0, 255, 0), 2)
-            expected_anchor_x = actual_cell_anchor_x
-            
-        final_text += line_text + "\n"
-
-    raw_output = final_text.strip()
-    raw_output = translator.post_process_text(raw_output)
-    ai_output = refiner.fix_text(raw_output)
-    translated_output = refiner.translate_text(ai_output, target_lang=target_lang)
-
-    _, buffer = cv2.imencode('.jpg', debug_img)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
+@app.get("/results/{result_id}/image")
+async def result_image_endpoint(result_id: str):
+    """Debug image (JPEG) of a recent /translate or /translate-batch result, drawn on request."""
+    stored = scan_store.get(result_id)
+    if stored is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired result"})
+    image = await cv_limiter.run(render_debug_jpeg, *stored)
+    return Response(image, media_type="image/jpeg", headers={"Cache-Control": "private, max-age=3600"})
 
-    return {
-        "raw": raw_output,
-        "ai": ai_output,
-        "translated": translated_output,
-        "image": f"data:image/jpeg;base64,{img_base64}"
-    }
+async def run_job(job, progress):
+    """Runs one /jobs upload through transcribe() once the model is up; busy pools are retried."""
+    if not refiner.ready.is_set():
+        progress("waiting")
+        while not refiner.ready.is_set():
+            await asyncio.sleep(RETRY_AFTER_SECONDS)
+    with open(job["input_path"], "rb") as f:
+        contents = f.read()
+    params = job["params"]
+    while True:
+        try:
+            result = await transcribe(contents, params["mode"], params["target_lang"], progress=progress)
+            break
+        except Overloaded as e:
+            progress("waiting")
+            await asyncio.sleep(e.retry_after)
+    if "error" in result:
+        raise ValueError(result["error"])
+    result.pop("image", None)
+    return result
+
+jobs = JobManager(JobStore(), run_job, retry_after=RETRY_AFTER_SECONDS)
+
+def job_view(request, job):
+    """A job as the API shows it, with the URLs to follow it."""
+    view = {key: job[key] for key in ("id", "status", "priority", "created", "updated", "params", "progress", "error")}
+    if "position" in job:
+        view["position"] = job["position"]
+    if job["result"] is not None:
+        view["result"] = with_image_fields(request, {**job["result"], "image": None})
+    view["status_url"] = str(request.url_for("job_endpoint", job_id=job["id"]))
+    view["events_url"] = str(request.url_for("job_events_endpoint", job_id=job["id"]))
+    return view
+
+@app.post("/jobs", status_code=202)
+async def create_job_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = Form(...),
+    target_lang: str = Form("english"),
+    priority: int = Form(0)
+):
+    """
+    Queues a /translate transcription and answers right away. Higher priorities run first;
+    follow the job with GET /jobs/{id} or its server-sent events.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(dir=JOBS_DIR, suffix=suffix, delete=False) as tmp:
+        while data := await file.read(CHUNK_SIZE):
+            tmp.write(data)
+    try:
+        job = jobs.submit({"mode": mode, "target_lang": target_lang}, tmp.name, priority)
+    except Overloaded:
+        os.remove(tmp.name)
+        raise
+    return job_view(request, job)
+
+@app.get("/jobs/{job_id}")
+async def job_endpoint(request: Request, job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    return job_view(request, job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job_endpoint(request: Request, job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    return job_view(request, job)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_endpoint(request: Request, job_id: str):
+    """Server-sent events: one event (named after the status) per change, until the job has finished."""
+    if jobs.get(job_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+
+    async def events():
+        async for job in jobs.watch(job_id):
+            if job is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {job['status']}\ndata: {json.dumps(job_view(request, job), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def refine_live(websocket, session, raw_output, target_lang):
+    """Refines and translates a stable live decode; skipped while the model is warming up or busy."""
+    if not refiner.ready.is_set():
+        return
+    try:
+        async with model_limiter.admit():
+            refined = await refine_text(raw_output, request_deadline(None, time.monotonic()))
+            translated_output = await translate_text(refined["ai"], target_lang)
+    except Overloaded:
+        return
+    session.refined_raw = raw_output
+    try:
+        await websocket.send_json({
+            "type": "refined",
+            "raw": raw_output,
+            "ai": refined["ai"],
+            "translated": translated_output,
+            **{k: v for k, v in refined.items() if k != "ai"}
+        })
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+@app.websocket("/live")
+async def live_endpoint(websocket: WebSocket, mode: str = PHOTO_MODE, target_lang: str = "english"):
+    """
+    Live camera mode. The client sends frames as binary JPEG/PNG messages and gets one "frame"
+    message per decoded frame. Frames that arrive meanwhile replace each other, so the newest is
+    always decoded next. A stable decode is refined in the background ("refined" message).
+    """
+    await websocket.accept()
+    session = LiveSession(mode)
+    latest = LatestFrame()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    latest.put(message["bytes"])
+        finally:
+            latest.close()
+
+    receiver = asyncio.create_task(receive_frames())
+    refining = None
+    try:
+        while (contents := await latest.get()) is not None:
+            PAYLOAD_BYTES.observe(len(contents), kind="live_frame")
+            # A full CV pool skips this frame instead of answering 503; the next one is retried
+            try:
+                async with cv_limiter.admit():
+                    message = await cv_limiter.call(session.process_frame, contents)
+            except Overloaded:
+                LIVE_FRAMES_TOTAL.inc(outcome="busy")
+                continue
+            LIVE_FRAMES_TOTAL.inc(outcome="processed")
+            message["dropped"] = latest.dropped
+            await websocket.send_json(message)
+            if session.should_refine(message) and (refining is None or refining.done()):
+                refining = asyncio.create_task(refine_live(websocket, session, message["raw"], target_lang))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if refining is not None:
+            refining.cancel()
+
+@app.post("/translate-document")
+async def translate_document_endpoint(
+    file: UploadFile = File(...),
+    mode: str = Form(...),
+    target_lang: str = Form("english"),
+    budget_ms: Optional[int] = Form(None),
+    x_latency_budget_ms: Optional[int] = Header(None)
+):
+    """
+    Multi-page PDF/TIFF upload, answered as NDJSON: a "page" event per decoded page, a
+    "section" event per refined part of the stitched text, then "done". Pages are read
+    one at a time from a temporary copy of the upload. CV and model slots are taken per
+    page, so a long document shares the server; the latency budget applies per page.
+    """
+    budget_ms = budget_ms if budget_ms is not None else x_latency_budget_ms
+    require_model()
+    # Spool the upload to disk: PDF/TIFF readers seek to one page at a time
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        size = 0
+        while data := await file.read(CHUNK_SIZE):
+            tmp.write(data)
+            size += len(data)
+    PAYLOAD_BYTES.observe(size, kind="document")
+
+    def line(event):
+        return json.dumps(event, ensure_ascii=False) + "\n"
+
+    # Once the document has started, a busy pool delays the next page instead of failing it
+    async def next_page(job):
+        while True:
+            try:
+                return await cv_limiter.run(job.next_page)
+            except Overloaded as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def refine_events(sections):
+        if not sections:
+            return
+        while True:
+            try:
+                async with model_limiter.admit():
+                    # The page's sections go through the batcher together, as one request
+                    deadline = request_deadline(budget_ms, time.monotonic())
+                    results = await asyncio.gather(*[refine_text(s["raw"], deadline) for s in sections])
+                    translations = await asyncio.gather(*[translate_text(r["ai"], target_lang) for r in results])
+                break
+            except Overloaded as e:
+                await asyncio.sleep(e.retry_after)
+        for section, refined, translated_output in zip(sections, results, translations):
+            section.update(refined, translated=translated_output)
+            yield line(section)
+
+    async def stream():
+        try:
+            job = await cv_limiter.run(DocumentJob, tmp.name, mode)
+            while (step := await next_page(job)) is not None:
+                event, sections = step
+                yield line(event)
+                async for section in refine_events(sections):
+                    yield section
+            async for section in refine_events(job.finish()):
+                yield section
+            yield line({"type": "done", "pages": job.count})
+        except Overloaded as e:
+            yield line({"type": "error", "error": str(e), "retry_after": e.retry_after})
+        except (ValueError, RuntimeError) as e:
+            yield line({"type": "error", "error": str(e)})
+        finally:
+            os.remove(tmp.name)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/translate-batch")
+async def translate_batch_endpoint(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    mode: str = Form(...),
+    target_lang: str = Form("english"),
+    include_image: bool = Form(False),
+    budget_ms: Optional[int] = Form(None),
+    x_latency_budget_ms: Optional[int] = Header(None)
+):
+    """
+    Decodes several scans in parallel, then refines and translates them together. The
+    latency budget (budget_ms or X-Latency-Budget-Ms) covers the whole batch.
+    """
+    global _scan_pool
+    deadline = request_deadline(budget_ms if budget_ms is not None else x_latency_budget_ms, time.monotonic())
+    require_model()
+    loop = asyncio.get_running_loop()
+    pool = get_scan_pool()
+
+    # 1. Preprocess/detect/decode every page in parallel on the process pool
+    async with cv_limiter.admit():
+        futures, uploads = [], []
+        for f in files:
+            contents = await f.read()
+            PAYLOAD_BYTES.observe(len(contents), kind="upload")
+            uploads.append(contents)
+            futures.append(loop.run_in_executor(pool, process_scan_bytes, contents, mode, include_image))
+        pages = await asyncio.gather(*futures, return_exceptions=True)
+
+    # A crashed worker breaks the whole pool; start a fresh one for the next batch
+    if any(isinstance(p, BrokenProcessPool) for p in pages):
+        _scan_pool = None
+    pages = [{"error": str(p) or type(p).__name__} if isinstance(p, BaseException) else p for p in pages]
+
+    # Worker processes have their own metrics; record their stage timings and scan stats here
+    for page in pages:
+        for name, seconds in page.get("timings", {}).items():
+            record_stage(name, seconds)
+        record_scan(page.get("stats"))
+        if page.get("image"):
+            PAYLOAD_BYTES.observe(len(page["image"]), kind="debug_image")
+
+    # 2. Each decoded page goes through the confidence gate and the refine batcher, so the
+    #    pages share batched model calls within the latency budget
+    decoded = [i for i, p in enumerate(pages) if p.get("raw")]
+    async with model_limiter.admit():
+        refined = await asyncio.gather(*[refine_text(pages[i]["raw"], deadline) for i in decoded])
+        translations = await asyncio.gather(*[translate_text(r["ai"], target_lang) for r in refined])
+    ai_by_page = dict(zip(decoded, zip(refined, translations)))
+
+    results = []
+    for i, (f, page) in enumerate(zip(files, pages)):
+        if "error" in page:
+            results.append({"filename": f.filename, "error": page["error"]})
+        elif i not in ai_by_page:
+            results.append({"filename": f.filename, "raw": "No dots found", "ai": "No dots found",
+                            "translated": "No dots found", "image": None})
+        else:
+            refined_page, translated_output = ai_by_page[i]
+            result_id = keep_scan(uploads[i], mode, page["rects"])
+            results.append({
+                "filename": f.filename,
+                "raw": page["raw"],
+                "ai": refined_page["ai"],
+                "translated": translated_output,
+                **image_fields(request, result_id, page["image"]),
+                **{k: v for k, v in refined_page.items() if k != "ai"}
+            })
+
+    return {"results": results}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,169 @@
+# braile/backend/src/metrics.py
+#
+# Minimal Prometheus-format metrics with no extra dependency: histograms, counters,
+# per-request stage timings (for Server-Timing) and scrape-time collectors.
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.environ.get("BRAILLE_METRICS", "1") != "0"
+SERVER_TIMING_ENABLED = os.environ.get("BRAILLE_SERVER_TIMING", "1") != "0"
+
+# Stage durations of the current request, shared with worker threads via the copied context
+REQUEST_TIMINGS = contextvars.ContextVar("request_timings", default=None)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+MEGAPIXEL_BUCKETS = (0.1, 0.3, 1, 2, 4, 8, 12, 16, 24, 48)
+BYTE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 5e7)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("braille_stage_seconds", "Time spent per pipeline stage", labelnames=("stage",))
+REQUEST_SECONDS = Histogram("braille_request_seconds", "HTTP request latency", labelnames=("path",))
+REQUESTS_TOTAL = Counter("braille_requests_total", "HTTP requests by path and status", ("path", "status"))
+DOTS_PER_IMAGE = Histogram("braille_dots_per_image", "Detected dots per image", COUNT_BUCKETS)
+CELLS_PER_IMAGE = Histogram("braille_cells_per_image", "Decoded cells per image", COUNT_BUCKETS)
+IMAGE_MEGAPIXELS = Histogram("braille_image_megapixels", "Uploaded image size", MEGAPIXEL_BUCKETS)
+PAYLOAD_BYTES = Histogram("braille_payload_bytes", "Upload and response payload sizes", BYTE_BUCKETS, ("kind",))
+REFINE_PATH_TOTAL = Counter("braille_refine_path_total", "Refinement path taken", ("path",))
+REFINE_STRATEGY_TOTAL = Counter("braille_refine_strategy_total", "Generation strategy picked for the latency budget", ("strategy",))
+REFINE_BATCH_SIZE = Histogram("braille_refine_batch_size", "Text segments per T5 generate call", (1, 2, 4, 8, 16, 32, 64))
+TRANSLATE_BATCH_SIZE = Histogram("braille_translate_batch_size", "Texts per translation backend call", (1, 2, 4, 8, 16, 32, 64))
+LIVE_FRAMES_TOTAL = Counter("braille_live_frames_total", "Live camera frames by outcome", ("outcome",))
+SCAN_CACHE_TOTAL = Counter("braille_scan_cache_total", "/translate result cache lookups", ("result",))
+ARCHIVE_FILES_TOTAL = Counter("braille_archive_files_total", "Scan archive files by outcome", ("outcome",))
+
+_METRICS = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS_TOTAL, DOTS_PER_IMAGE, CELLS_PER_IMAGE,
+            IMAGE_MEGAPIXELS, PAYLOAD_BYTES, REFINE_PATH_TOTAL, REFINE_STRATEGY_TOTAL,
+            REFINE_BATCH_SIZE, TRANSLATE_BATCH_SIZE, LIVE_FRAMES_TOTAL, SCAN_CACHE_TOTAL,
+            ARCHIVE_FILES_TOTAL]
+_COLLECTORS = []
+
+
+def register_collector(fn):
+    """fn() returns extra exposition lines at scrape time (e.g. cache counters)."""
+    _COLLECTORS.append(fn)
+
+
+def record_stage(name, seconds):
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = REQUEST_TIMINGS.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    """Times a block as one pipeline stage (histogram + this request's Server-Timing)."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+def record_scan(stats):
+    """Records the per-image stats filled in by pipeline.scan_to_text()."""
+    if not METRICS_ENABLED or not stats:
+        return
+    IMAGE_MEGAPIXELS.observe(stats["megapixels"])
+    DOTS_PER_IMAGE.observe(stats["dots"])
+    CELLS_PER_IMAGE.observe(stats["cells"])
+
+
+def server_timing_header(timings):
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def render():
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for fn in _COLLECTORS:
+        try:
+            lines.extend(fn())
+        except Exception as e:
+            lines.append(f"# collector error: {e}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,282 @@
+# braile/backend/src/model_server.py
+#
+# One process owns Flan-T5 and the translation models and serves them over a Unix socket,
+# so several uvicorn workers and the Gradio app share one model copy (run from backend/):
+#   python src/model_server.py --socket data/model.sock
+#   BRAILLE_MODEL_SOCKET=data/model.sock uvicorn main:app --app-dir src --workers 4
+# Requests from all clients are merged by the same batchers the API uses in-process.
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_refiner import AIRefiner
+from batcher import RefineBatcher, TranslateBatcher
+
+# Socket of the model server; empty means every process loads its own model
+MODEL_SOCKET = os.environ.get("BRAILLE_MODEL_SOCKET", "")
+# How long a client waits for the socket to appear before loading the model itself
+MODEL_CONNECT_TIMEOUT = float(os.environ.get("BRAILLE_MODEL_CONNECT_TIMEOUT", 10))
+# Longest a single request may take (a big batch on a busy CPU)
+MODEL_REQUEST_TIMEOUT = float(os.environ.get("BRAILLE_MODEL_REQUEST_TIMEOUT", 300))
+# Status and cache counters answer at once; probes shouldn't hang on a stuck server
+MODEL_STATUS_TIMEOUT = 5
+MODEL_SERVER_WORKERS = int(os.environ.get("BRAILLE_MODEL_WORKERS", 2))
+REFINE_MAX_BATCH = int(os.environ.get("BRAILLE_REFINE_MAX_BATCH", 8))
+REFINE_MAX_WAIT_MS = int(os.environ.get("BRAILLE_REFINE_MAX_WAIT_MS", 20))
+TRANSLATE_MAX_BATCH = int(os.environ.get("BRAILLE_TRANSLATE_MAX_BATCH", 16))
+TRANSLATE_MAX_WAIT_MS = int(os.environ.get("BRAILLE_TRANSLATE_MAX_WAIT_MS", 20))
+
+# Messages are JSON objects, each preceded by its length as a 4-byte big-endian integer
+_HEADER = struct.Struct(">I")
+
+
+def _encode(message):
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Model server closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+class _RemoteCache:
+    """Stand-in for a ResultCache of the server, for the cache metrics."""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def stats(self):
+        try:
+            return self.client.cache_stats()[self.name]
+        except (OSError, RuntimeError, KeyError):
+            return {}
+
+
+class RemoteRefiner:
+    """
+    AIRefiner interface backed by the model server. Each thread keeps its own connection.
+    If the server cannot be reached (at load or later), a local AIRefiner is loaded
+    and used from then on.
+    """
+
+    def __init__(self, path=MODEL_SOCKET):
+        self.path = path
+        self.ready = threading.Event()
+        self.server_status = {}
+        self.local = None
+        self.connections = threading.local()
+        self._lock = threading.Lock()
+        self._cache_stats = (0.0, {})
+
+    @property
+    def refine_cache(self):
+        return self.local.refine_cache if self.local else _RemoteCache(self, "refine")
+
+    @property
+    def translate_cache(self):
+        return self.local.translate_cache if self.local else _RemoteCache(self, "translate")
+
+    def load(self):
+        """Waits for the server (and its warm-up); falls back to a local model if there is none."""
+        deadline = time.monotonic() + MODEL_CONNECT_TIMEOUT
+        announced = False
+        while self.local is None:
+            try:
+                status = self._call({"op": "status"})
+            except OSError:
+                if time.monotonic() > deadline:
+                    print(f"[-] Model server {self.path} unreachable; loading the model in-process.")
+                    self._use_local()
+                    break
+                time.sleep(0.5)
+                continue
+            if status["ready"]:
+                self.server_status = status
+                print(f"[+] Using the model server at {self.path}")
+                break
+            if not announced:
+                print(f"[*] Waiting for the model server at {self.path} to finish loading...")
+                announced = True
+            time.sleep(0.5)
+        self.ready.set()
+
+    def status(self):
+        if self.local:
+            return self.local.status()
+        try:
+            status = self._call({"op": "status"}, MODEL_STATUS_TIMEOUT)
+        except (OSError, RuntimeError):
+            status = {**self.server_status, "ready": False}
+        return {**status, "ready": self.ready.is_set() and status.get("ready", False), "model_server": self.path}
+
+    def model_key(self):
+        return self.local.model_key() if self.local else self.server_status["model_key"]
+
+    def cache_stats(self):
+        # Scrapes read both caches; one round trip serves them
+        fetched_at, stats = self._cache_stats
+        if time.monotonic() - fetched_at > 1:
+            stats = self._call({"op": "cache_stats"}, MODEL_STATUS_TIMEOUT)
+            self._cache_stats = (time.monotonic(), stats)
+        return stats
+
+    def fix_text(self, text, strategy="beam"):
+        return self.fix_batch([text], strategy)[0]
+
+    def fix_batch(self, texts, strategy="beam"):
+        return [text for text, _ in self.refine_batch(texts, strategy)]
+
+    def refine_batch(self, texts, strategy="beam"):
+        return [(text, ok) for text, ok, _ in self.refine_batch_usage(texts, strategy)]
+
+    def refine_batch_usage(self, texts, strategy="beam"):
+        results = self._remote_or_local("refine_batch", {"texts": list(texts), "strategy": strategy})
+        return [tuple(result) for result in results]
+
+    def translate_text(self, text, target_lang='hindi'):
+        return self.translate_batch([text], target_lang)[0]
+
+    def translate_batch(self, texts, target_lang='hindi'):
+        return self._remote_or_local("translate_batch", {"texts": list(texts), "target_lang": target_lang})
+
+    def _remote_or_local(self, op, args):
+        if self.local is None:
+            try:
+                return self._call({"op": op, **args})
+            except OSError as e:
+                print(f"[-] Model server request failed ({e}); loading the model in-process.")
+                self._use_local()
+        if op == "refine_batch":
+            return self.local.refine_batch_usage(args["texts"], args["strategy"])
+        return self.local.translate_batch(args["texts"], args["target_lang"])
+
+    def _use_local(self):
+        with self._lock:
+            if self.local is None:
+                local = AIRefiner()
+                local.load()
+                self.local = local
+
+    def _call(self, message, timeout=MODEL_REQUEST_TIMEOUT):
+        """One request/response; reconnects once if the connection went stale."""
+        for attempt in (0, 1):
+            sock = getattr(self.connections, "sock", None)
+            try:
+                if sock is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.settimeout(MODEL_CONNECT_TIMEOUT)
+                    sock.connect(self.path)
+                    self.connections.sock = sock
+                sock.settimeout(timeout)
+                sock.sendall(_encode(message))
+                (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+                reply = json.loads(_recv_exact(sock, size))
+                break
+            except OSError:
+                if sock is not None:
+                    sock.close()
+                self.connections.sock = None
+                if attempt == 1:
+                    raise
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+
+def build_refiner(path=MODEL_SOCKET):
+    """The model server's client if BRAILLE_MODEL_SOCKET is set, else an in-process AIRefiner."""
+    return RemoteRefiner(path) if path else AIRefiner()
+
+
+class ModelServer:
+    """Serves one AIRefiner to any number of local clients, batching across all of them."""
+
+    def __init__(self, refiner):
+        self.refiner = refiner
+        self.executor = ThreadPoolExecutor(max_workers=MODEL_SERVER_WORKERS, thread_name_prefix="model-worker")
+        self.refine_batcher = RefineBatcher(refiner, REFINE_MAX_BATCH, REFINE_MAX_WAIT_MS, self.executor)
+        self.translate_batcher = TranslateBatcher(refiner, TRANSLATE_MAX_BATCH, TRANSLATE_MAX_WAIT_MS, self.executor)
+
+    async def handle(self, op, message):
+        if op == "status":
+            return {**self.refiner.status(), "model_key": self.refiner.model_key()}
+        if op == "cache_stats":
+            return {"refine": self.refiner.refine_cache.stats(), "translate": self.refiner.translate_cache.stats()}
+        if op == "refine_batch":
+            strategy = message.get("strategy", "beam")
+            results = await asyncio.gather(*[self.refine_batcher.fix_text(t, strategy) for t in message["texts"]])
+            return [[text, refined, tokens] for text, _, refined, tokens in results]
+        if op == "translate_batch":
+            lang = message["target_lang"]
+            return list(await asyncio.gather(*[self.translate_batcher.translate_text(t, lang) for t in message["texts"]]))
+        raise ValueError(f"Unknown operation '{op}'")
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                message = json.loads(await reader.readexactly(_HEADER.unpack(header)[0]))
+                try:
+                    reply = {"result": await self.handle(message.get("op"), message)}
+                except Exception as e:
+                    reply = {"error": str(e) or type(e).__name__}
+                writer.write(_encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path):
+        # Listen right away; clients wait for "ready" while the model loads
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        loading = loop.run_in_executor(self.executor, self.refiner.load)
+        if os.path.exists(path):
+            os.remove(path)  # left over from a previous run
+        server = await asyncio.start_unix_server(self.serve_client, path)
+        print(f"[+] Model server listening on {path}")
+        try:
+            async with server:
+                await loading
+                await server.serve_forever()
+        finally:
+            await self.refine_batcher.close()
+            await self.translate_batcher.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Flan-T5 refinement and translation over a Unix socket")
+    parser.add_argument("--socket", default=MODEL_SOCKET or "data/model.sock", help="Unix socket path")
+    args = parser.parse_args()
+    folder = os.path.dirname(args.socket)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    try:
+        asyncio.run(ModelServer(AIRefiner()).serve(args.socket))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("[*] Model server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# braile/backend/src/pipeline.py
+
+import cv2
+import numpy as np
+
+from preprocess import locate_scan, clean_image, dots_to_frame, MORPH_GROWTH_PX
+from detector import detect_dots
+from tiling import use_tiles, detect_dots_tiled
+from translator import BrailleTranslator
+from cell_engine import CellEngine, Calibration, draw_cells, dots_to_array, assign_lines, W, H
+from metrics import stage, REQUEST_TIMINGS
+
+PHOTO_MODE = "Real Photo (Embossed)"
+
+# Model-free objects only: this module is imported by the process-pool workers
+translator = BrailleTranslator()
+engine = CellEngine(translator)
+
+
+def read_scan(contents):
+    """Decodes uploaded image bytes into a BGR image (None if they are not an image)."""
+    with stage("imdecode"):
+        nparr = np.frombuffer(contents, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def find_dots(img_cv, is_photo, dot_px=None):
+    """preprocess -> detect. Returns the dots in frame pixels and the ScanRegion that was cleaned."""
+    with stage("preprocess"):
+        region = locate_scan(img_cv, is_photo, dot_px)
+        tiled = use_tiles(region.image)
+        thresh = None if tiled else clean_image(region.image, is_photo)
+    with stage("detect"):
+        # Very large pages are cleaned strip by strip together with detection
+        dots = detect_dots_tiled(region.image, is_photo) if tiled else detect_dots(thresh)
+        dots = dots_to_frame(dots, region)
+    return dots, region
+
+
+def decode_scan(img_cv, mode, stats=None):
+    """
+    Runs preprocess -> detect -> decode on one scan. Returns (raw_text or None, cell rects).
+    If `stats` is a dict it receives the image megapixels and dot/cell counts.
+    """
+    dots, _ = find_dots(img_cv, mode == PHOTO_MODE)
+    if stats is not None:
+        stats.update(megapixels=img_cv.shape[0] * img_cv.shape[1] / 1e6, dots=len(dots), cells=0)
+    if len(dots) == 0:
+        return None, None
+
+    with stage("decode"):
+        result = engine.decode(dots)
+        raw_output = translator.post_process_text(result.text)
+    if stats is not None:
+        stats["cells"] = result.num_cells
+    return raw_output, result.rects
+
+
+def render_debug(img_cv, rects):
+    """Copy of the scan with the decoded cells outlined."""
+    with stage("render_debug"):
+        debug_img = img_cv.copy()
+        if rects is not None:
+            draw_cells(debug_img, np.asarray(rects))
+    return debug_img
+
+
+def scan_to_text(img_cv, mode, stats=None):
+    """decode_scan() plus the annotated debug image: (raw_text or None, debug_img)."""
+    raw_output, rects = decode_scan(img_cv, mode, stats)
+    return raw_output, render_debug(img_cv, rects)
+
+
+class CalibratedScanner:
+    """
+    Decodes a run of scans with the same layout (camera frames of one page, pages of one book).
+    The geometry (dot pitch, cell stride, dot size) is measured on the first scan with at least
+    `min_cells` cells and reused until a scan's dot size drifts by more than `drift` (relative)
+    or `max_age` scans have passed.
+    """
+
+    def __init__(self, mode, drift, max_age=None, min_cells=1):
+        self.is_photo = (mode == PHOTO_MODE)
+        self.drift = drift
+        self.max_age = max_age
+        self.min_cells = min_cells
+        self.calibration = None
+        self.calibrated_at = 0
+        self.scans = 0
+
+    def _needs_calibration(self, dot_px):
+        cal = self.calibration
+        if cal is None or (self.max_age and self.scans - self.calibrated_at >= self.max_age):
+            return True
+        return abs(dot_px - cal.dot_px) > self.drift * cal.dot_px
+
+    def decode(self, img_cv):
+        """Returns (DecodeResult, raw_text, recalibrated), or (None, None, False) without dots."""
+        self.scans += 1
+
+        # 1. Dots, with the calibrated dot size sparing the resolution probe on large scans
+        cal = self.calibration
+        dots, region = find_dots(img_cv, self.is_photo, cal.dot_px if cal else None)
+        if len(dots) == 0:
+            return None, None, False
+
+        # 2. Decode with the calibrated pitch unless the dots grew or shrank
+        with stage("decode"):
+            D, line_id = assign_lines(dots_to_array(dots))
+            # Scan-pixel dot diameter without the blob growth of clean_image()
+            dot_px = float(np.median(D[:, W:H + 1])) - MORPH_GROWTH_PX[self.is_photo] / region.scale[0]
+            recalibrated = self._needs_calibration(dot_px)
+            result = engine.decode_lines(D, line_id, None if recalibrated else cal)
+            raw_output = translator.post_process_text(result.text)
+        if recalibrated and result.num_cells >= self.min_cells:
+            self.calibration = Calibration(result.S_x, result.S_y, result.stride, dot_px)
+            self.calibrated_at = self.scans
+        return result, raw_output, recalibrated
+
+
+def process_scan_bytes(contents, mode, include_image=False):
+    """
+    Process-pool entry point: one uploaded page in, raw text and cell rects out (plus the
+    JPEG debug image if asked for).
+    """
+    # Stage timings and scan stats travel back to the parent, which records them
+    timings, stats = {}, {}
+    REQUEST_TIMINGS.set(timings)
+
+    img_cv = read_scan(contents)
+    if img_cv is None:
+        return {"error": "Invalid Image", "timings": timings}
+
+    raw_output, rects = decode_scan(img_cv, mode, stats)
+    if raw_output is None:
+        return {"raw": None, "rects": None, "image": None, "timings": timings, "stats": stats}
+
+    image = encode_jpeg(render_debug(img_cv, rects)) if include_image else None
+    return {"raw": raw_output, "rects": rects.tolist(), "image": image, "timings": timings, "stats": stats}
+
+
+def encode_jpeg(img):
+    with stage("encode_image"):
+        _, buffer = cv2.imencode('.jpg', img)
+    return buffer.tobytes()
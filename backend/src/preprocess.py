@@ -1,15 +1,49 @@
 # braile/backend/src/preprocess.py
 
+import os
+from collections import namedtuple
+
 import cv2
 import numpy as np
 
-def clean_image(img, is_photo_mode=True):
+from detector import detect_dots
+
+# Resolution-adaptive mode: large photos are probed at low resolution first, then only the
+# Braille block is cleaned, at the smallest scale that keeps dots at least MIN_DOT_PX wide.
+# clean_image()'s fixed kernels suit ~8 px printed dots; embossed dots are only shrunk down to 48 px.
+# Off by default (BRAILLE_ADAPTIVE_PREPROCESS=1 enables it): it is only checked on upscaled scans so far.
+ADAPTIVE_PREPROCESS = os.environ.get("BRAILLE_ADAPTIVE_PREPROCESS", "0") == "1"
+ADAPTIVE_MIN_MEGAPIXELS = float(os.environ.get("BRAILLE_ADAPTIVE_MIN_MP", 2.0))
+MIN_DOT_PX = {
+    True: float(os.environ.get("BRAILLE_MIN_DOT_PX_PHOTO", 48)),
+    False: float(os.environ.get("BRAILLE_MIN_DOT_PX_DIGITAL", 8)),
+}
+PROBE_MAX_SIDE = 1024
+MIN_PROBE_DOTS = 6
+CROP_MARGIN = 0.05
+SAMPLE_SIDE = (256, 1024)
+# clean_image() grows every blob: photo mode dilates twice/erodes once (3x3), digital dilates once (2x2)
+MORPH_GROWTH_PX = {True: 2, False: 1}
+CLAHE_CLIP_LIMIT = 3.0
+CLAHE_GRID = (8, 8)
+
+# Crop of the original frame to process, and the offset/scale that map it back onto the frame
+ScanRegion = namedtuple("ScanRegion", ["image", "offset", "scale"])
+
+def clean_image(img, is_photo_mode=True, threshold=None, equalize=None):
+    """
+    Binary dot mask of a BGR scan. `threshold` replaces the digital-mode Otsu threshold and
+    `equalize(gray)` the photo-mode CLAHE; tiled processing passes page-wide versions of both.
+    """
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     
     if is_photo_mode:
         # 1. Equalize lighting across the curved page/shadows
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
+        if equalize is None:
+            clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_GRID)
+            enhanced = clahe.apply(gray)
+        else:
+            enhanced = equalize(gray)
         
         # 2. Blur to remove paper texture and grain
         blurred = cv2.GaussianBlur(enhanced, (5, 5), 0)
@@ -30,8 +64,96 @@ def clean_image(img, is_photo_mode=True):
         
     else:
         # Digital Mode
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        if threshold is None:
+            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        else:
+            _, thresh = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
         kernel_clean = np.ones((2, 2), np.uint8)
         thresh = cv2.dilate(thresh, kernel_clean, iterations=1)
         
-    return thresh
\ No newline at end of file
+    return thresh
+
+def locate_scan(img, is_photo_mode=True, dot_px=None):
+    """
+    Crops large images to the Braille block and downscales them to MIN_DOT_PX-wide dots
+    before clean_image(); small images are returned as is.
+    A known full-resolution dot diameter `dot_px` skips measuring it (live camera frames).
+    """
+    h, w = img.shape[:2]
+    if not ADAPTIVE_PREPROCESS or h * w < ADAPTIVE_MIN_MEGAPIXELS * 1e6:
+        return ScanRegion(img, (0, 0), (1.0, 1.0))
+
+    # 1. Image pyramid down to probe size; the probe finds the block and the dot size
+    pyramid = [img]
+    while max(pyramid[-1].shape[:2]) > PROBE_MAX_SIDE:
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    region = probe_text_region(pyramid, is_photo_mode, dot_px)
+    if region is None:
+        return ScanRegion(img, (0, 0), (1.0, 1.0))
+
+    # 2. Crop the block from a pyramid level, then INTER_AREA-resize the remaining factor.
+    #    Keep that factor <= 1/2: closer to 1, INTER_AREA blurs like bilinear and dots smear.
+    (x0, y0, x1, y1), dot_px = region
+    scale = min(1.0, MIN_DOT_PX[bool(is_photo_mode)] / dot_px)
+    level = pyramid[0]
+    for candidate in pyramid[1:]:
+        if candidate.shape[1] / w < 2 * scale:
+            break
+        level = candidate
+    lx, ly = level.shape[1] / w, level.shape[0] / h
+    lx0, ly0 = int(x0 * lx), int(y0 * ly)
+    lx1, ly1 = max(int(np.ceil(x1 * lx)), lx0 + 1), max(int(np.ceil(y1 * ly)), ly0 + 1)
+    crop = level[ly0:ly1, lx0:lx1]
+    rest = scale / lx
+    if rest < 1.0:
+        crop = cv2.resize(crop, None, fx=rest, fy=rest, interpolation=cv2.INTER_AREA)
+    sx, sy = crop.shape[1] / (lx1 - lx0) * lx, crop.shape[0] / (ly1 - ly0) * ly
+    return ScanRegion(crop, (lx0 / lx, ly0 / ly), (sx, sy))
+
+def probe_text_region(pyramid, is_photo_mode=True, dot_px=None):
+    """
+    Finds the Braille block on the smallest pyramid level and measures the dot size on a
+    small full-resolution sample of it (at low resolution neighbouring dots merge), unless
+    `dot_px` is given. Returns ((x0, y0, x1, y1), dot diameter) in full-resolution pixels,
+    or None if unsure.
+    """
+    img, probe = pyramid[0], pyramid[-1]
+
+    # 1. Text region = bounding box of the blobs found on the reduced image, plus a margin
+    blobs = _dot_array(detect_dots(clean_image(probe, is_photo_mode)))
+    if len(blobs) < MIN_PROBE_DOTS:
+        return None
+    H, W = img.shape[:2]
+    fx, fy = W / probe.shape[1], H / probe.shape[0]
+    mx, my = CROP_MARGIN * W, CROP_MARGIN * H
+    x0 = max(int(blobs[:, 0].min() * fx - mx), 0)
+    y0 = max(int(blobs[:, 1].min() * fy - my), 0)
+    x1 = min(int((blobs[:, 0] + blobs[:, 2]).max() * fx + mx), W)
+    y1 = min(int((blobs[:, 1] + blobs[:, 3]).max() * fy + my), H)
+
+    if dot_px is not None:
+        return (x0, y0, x1, y1), max(dot_px, 1.0)
+
+    # 2. Dot size from a full-resolution window around the blob nearest the block's centre
+    cx, cy = blobs[:, 4] * fx, blobs[:, 5] * fy
+    k = np.argmin(np.hypot(cx - cx.mean(), cy - cy.mean()))
+    side = int(np.clip(8 * np.median(blobs[:, 2:4]) * fx, *SAMPLE_SIDE))
+    sx0, sy0 = max(int(cx[k]) - side // 2, 0), max(int(cy[k]) - side // 2, 0)
+    dots = _dot_array(detect_dots(clean_image(img[sy0:sy0 + side, sx0:sx0 + side], is_photo_mode)))
+    if len(dots) < MIN_PROBE_DOTS:
+        return None
+    dot_px = np.median(dots[:, 2:4]) - MORPH_GROWTH_PX[bool(is_photo_mode)]
+    return (x0, y0, x1, y1), max(dot_px, 1.0)
+
+def _dot_array(dots):
+    return np.asarray(dots, dtype=np.float64).reshape(-1, 6)
+
+def dots_to_frame(dots, prepared):
+    """Maps (x, y, w, h, cx, cy) dots found on a ScanRegion back to original-image pixels."""
+    if prepared.offset == (0, 0) and prepared.scale == (1.0, 1.0):
+        return dots
+    D = _dot_array(dots)
+    (x0, y0), (sx, sy) = prepared.offset, prepared.scale
+    x, y = D[:, 0] / sx + x0, D[:, 1] / sy + y0
+    w, h = D[:, 2] / sx, D[:, 3] / sy
+    return np.stack([x, y, w, h, x + w / 2.0, y + h / 2.0], axis=1)
@@ -0,0 +1,86 @@
+# braile/backend/src/refiner_backends.py
+
+import os
+import time
+
+# Which engine runs Flan-T5: "transformers" (PyTorch pipeline) or "onnx" (ONNX Runtime, int8)
+REFINER_BACKEND = os.environ.get("BRAILLE_REFINER_BACKEND", "transformers").lower()
+ONNX_MODEL_DIR = os.environ.get("BRAILLE_ONNX_DIR", "data/models")
+
+ONNX_FILES = ["encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx"]
+
+
+def build_transformers_pipeline(model_name, device):
+    """The original PyTorch text2text pipeline."""
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=model_name, device=device)
+
+
+def _quantized_name(file_name):
+    return file_name.replace(".onnx", "_quantized.onnx")
+
+
+def export_quantized_onnx(model_name, out_dir):
+    """
+    Exports the encoder, decoder and decoder-with-past graphs to ONNX, then applies
+    int8 dynamic quantization to each of them. Skipped if the files already exist.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    if all(os.path.exists(os.path.join(out_dir, _quantized_name(f))) for f in ONNX_FILES):
+        return out_dir
+
+    print(f"[*] Exporting {model_name} to ONNX in {out_dir}...")
+    t0 = time.perf_counter()
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True, use_merged=False)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(out_dir)
+
+    # Dynamic quantization: int8 weights, activations quantized on the fly (no calibration data)
+    qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    for file_name in ONNX_FILES:
+        quantizer = ORTQuantizer.from_pretrained(out_dir, file_name=file_name)
+        quantizer.quantize(save_dir=out_dir, quantization_config=qconfig)
+    print(f"[+] ONNX export and quantization done in {time.perf_counter() - t0:.1f}s")
+    return out_dir
+
+
+def build_onnx_pipeline(model_name, onnx_dir=ONNX_MODEL_DIR):
+    """
+    Flan-T5 under ONNX Runtime on CPU. The decoder-with-past graph reuses the
+    attention KV cache between generation steps instead of recomputing the prefix.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer, pipeline
+
+    out_dir = os.path.join(onnx_dir, model_name.replace("/", "__") + "-int8")
+    export_quantized_onnx(model_name, out_dir)
+    model = ORTModelForSeq2SeqLM.from_pretrained(
+        out_dir,
+        encoder_file_name=_quantized_name(ONNX_FILES[0]),
+        decoder_file_name=_quantized_name(ONNX_FILES[1]),
+        decoder_with_past_file_name=_quantized_name(ONNX_FILES[2]),
+        use_cache=True,
+        provider="CPUExecutionProvider",
+    )
+    tokenizer = AutoTokenizer.from_pretrained(out_dir)
+    return pipeline("text2text-generation", model=model, tokenizer=tokenizer)
+
+
+def build_pipeline(model_name, device, backend=REFINER_BACKEND):
+    """
+    Returns a text2text pipeline for the requested backend. Both backends expose the
+    same call interface, so AIRefiner.fix_text/fix_batch don't care which one runs.
+    """
+    if backend == "onnx":
+        if device != -1:
+            print("[*] ONNX backend requested on a GPU node; using it on CPU anyway.")
+        try:
+            return build_onnx_pipeline(model_name), "onnx"
+        except Exception as e:
+            print(f"[-] ONNX backend unavailable ({e}); falling back to transformers.")
+    elif backend != "transformers":
+        print(f"[-] Unknown refiner backend '{backend}'; using transformers.")
+    return build_transformers_pipeline(model_name, device), "transformers"
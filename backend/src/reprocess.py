@@ -0,0 +1,234 @@
+# braile/backend/src/reprocess.py
+#
+# Re-runs the pipeline over the scan archive after a tuning change (run from backend/):
+#   python src/reprocess.py                                 # decode new or affected scans
+#   python src/reprocess.py --refiner real --batch-size 64  # also refine, in large batches
+#   python src/reprocess.py --format parquet --output data/reprocess.parquet
+# A manifest keyed by file hash, scan mode and pipeline version records every finished scan,
+# so a re-run only decodes new files or files whose result the change can affect, and an
+# interrupted run continues where it stopped.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import make_key
+from pipeline import read_scan, decode_scan, PHOTO_MODE
+
+MODES = {"digital": "Digital/Black Dots", "photo": PHOTO_MODE}
+SCAN_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+# Modules whose code and settings decide the raw text of a scan
+PIPELINE_MODULES = ["preprocess.py", "detector.py", "tiling.py", "cell_engine.py", "translator.py", "pipeline.py"]
+MANIFEST_PATH = os.environ.get("BRAILLE_REPROCESS_MANIFEST", "data/reprocess.sqlite3")
+
+
+def pipeline_version():
+    """Hash of the decode modules' source and of the BRAILLE_* settings they read."""
+    digest = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    settings = {}
+    for name in PIPELINE_MODULES:
+        with open(os.path.join(folder, name), "rb") as f:
+            source = f.read()
+        digest.update(name.encode() + b"\0" + source)
+        for var in re.findall(rb'os\.environ\.get\("(BRAILLE_\w+)"', source):
+            settings[var.decode()] = os.environ.get(var.decode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def decode_file(path, mode):
+    """Process-pool entry point: one archived scan in, its raw text and counts out."""
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        img = read_scan(f.read())
+    if img is None:
+        return {"error": "Unreadable image", "seconds": time.perf_counter() - t0}
+    stats = {}
+    raw_output, _ = decode_scan(img, MODES[mode], stats)
+    return {"raw": raw_output, "cells": stats.get("cells", 0), "dots": stats.get("dots", 0),
+            "seconds": time.perf_counter() - t0}
+
+
+class Manifest:
+    """SQLite record of finished scans, plus cached file hashes by (path, size, mtime)."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, file_hash TEXT)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results (file_hash TEXT, mode TEXT, version TEXT, raw TEXT, "
+            "cells INTEGER, dots INTEGER, seconds REAL, error TEXT, ai TEXT, refine_path TEXT, "
+            "refine_key TEXT, updated REAL, PRIMARY KEY (file_hash, mode, version))"
+        )
+        self.db.commit()
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        row = self.db.execute("SELECT size, mtime, file_hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                        (path, stat.st_size, stat.st_mtime, file_hash))
+        return file_hash
+
+    def done(self, version):
+        return {(h, m) for h, m in self.db.execute("SELECT file_hash, mode FROM results WHERE version = ?", (version,))}
+
+    def add(self, file_hash, mode, version, result):
+        self.db.execute(
+            "INSERT OR REPLACE INTO results (file_hash, mode, version, raw, cells, dots, seconds, error, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_hash, mode, version, result.get("raw"), result.get("cells"), result.get("dots"),
+             result.get("seconds"), result.get("error"), time.time())
+        )
+        self.db.commit()
+
+    def unrefined(self, version, refine_key):
+        rows = self.db.execute(
+            "SELECT file_hash, mode, raw FROM results WHERE version = ? AND raw IS NOT NULL "
+            "AND (refine_key IS NULL OR refine_key != ?)", (version, refine_key)
+        )
+        return [{"file_hash": h, "mode": m, "raw": raw} for h, m, raw in rows]
+
+    def set_refined(self, records, version, refine_key):
+        self.db.executemany(
+            "UPDATE results SET ai = ?, refine_path = ?, refine_key = ? WHERE file_hash = ? AND mode = ? AND version = ?",
+            [(r["ai"], r["refine_path"], refine_key, r["file_hash"], r["mode"], version) for r in records]
+        )
+        self.db.commit()
+
+    def records(self, version, scans, refine_key=None):
+        """Output rows for `scans` [(path, file_hash, mode)] from this pipeline version."""
+        rows = {}
+        for row in self.db.execute(
+            "SELECT file_hash, mode, raw, cells, dots, seconds, error, ai, refine_path, refine_key "
+            "FROM results WHERE version = ?", (version,)
+        ):
+            rows[row[0], row[1]] = row
+        for path, file_hash, mode in scans:
+            row = rows.get((file_hash, mode))
+            if row is None:
+                continue
+            record = {"path": path, "file_hash": file_hash, "mode": mode, "version": version,
+                      "raw": row[2], "cells": row[3], "dots": row[4], "seconds": row[5], "error": row[6]}
+            if refine_key is not None:
+                fresh = row[9] == refine_key
+                record.update(ai=row[7] if fresh else None, refine_path=row[8] if fresh else None)
+            yield record
+
+
+def list_scans(folder):
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(SCAN_EXTENSIONS)
+    )
+
+
+def write_output(records, path, fmt):
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("[-] Parquet output needs pyarrow (pip install pyarrow)")
+        pq.write_table(pa.Table.from_pylist(list(records)), path)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run the pipeline over archived scans, incrementally")
+    parser.add_argument("--input", default="data/input", help="Folder of archived scans")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--output", default="data/reprocess.jsonl")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--refiner", choices=["none", "real"], default="none")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per offline refinement batch")
+    parser.add_argument("--force", action="store_true", help="Decode every scan again")
+    args = parser.parse_args()
+
+    version = pipeline_version()
+    manifest = Manifest(args.manifest)
+
+    # 1. Hash the archive (cached by size/mtime) and find what this version has not seen
+    paths = list_scans(args.input)
+    scans = [(path, manifest.file_hash(path), mode) for path in paths for mode in args.modes]
+    manifest.db.commit()
+    done = set() if args.force else manifest.done(version)
+    todo = {}
+    for path, file_hash, mode in scans:
+        todo.setdefault((file_hash, mode), path)  # identical files are decoded once
+    todo = {key: path for key, path in todo.items() if key not in done}
+    print(f"[*] Pipeline {version}: {len(paths)} scan(s), {len(todo)} scan/mode pair(s) to decode", file=sys.stderr)
+
+    # 2. Decode in parallel; every finished scan is committed, so an interrupted run resumes here
+    t0 = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {pool.submit(decode_file, path, mode): (file_hash, mode)
+                       for (file_hash, mode), path in todo.items()}
+            for k, future in enumerate(as_completed(futures), 1):
+                file_hash, mode = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": str(e) or type(e).__name__}
+                manifest.add(file_hash, mode, version, result)
+                if k % 50 == 0 or k == len(futures):
+                    elapsed = time.perf_counter() - t0
+                    print(f"[+] Decoded {k}/{len(futures)} ({k / elapsed:.1f}/s)", file=sys.stderr)
+
+    # 3. Optional refinement of decoded text that this refiner has not seen, in large batches
+    refine_key = None
+    if args.refiner == "real":
+        from model_server import build_refiner
+        from spellcheck import FastPath
+        from document import refine_sections
+        refiner, fast_path = build_refiner(), FastPath()
+        fast_path.load()
+        refiner.load()
+        refine_key = make_key(*refiner.model_key())
+        pending = manifest.unrefined(version, refine_key)
+        print(f"[*] Refining {len(pending)} text(s)", file=sys.stderr)
+        size = max(1, args.batch_size)
+        failed = 0
+        for start in range(0, len(pending), size):
+            batch = refine_sections(pending[start:start + size], refiner, fast_path)
+            # Texts the model could not refine stay pending for the next run
+            manifest.set_refined([r for r in batch if r["refined"]], version, refine_key)
+            failed += sum(not r["refined"] for r in batch)
+            print(f"[+] Refined {min(start + size, len(pending))}/{len(pending)}", file=sys.stderr)
+        if failed:
+            print(f"[-] {failed} text(s) could not be refined; they are retried on the next run", file=sys.stderr)
+
+    # 4. Output for the whole archive, new and unchanged scans alike
+    folder = os.path.dirname(args.output)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    write_output(manifest.records(version, scans, refine_key), args.output, args.format)
+    print(f"[+] Wrote {args.output} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
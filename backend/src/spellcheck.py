@@ -0,0 +1,159 @@
+# braile/backend/src/spellcheck.py
+
+import os
+import re
+import threading
+import time
+
+# The fast path is off unless enabled; then the word list comes from the sources in load_words()
+FAST_PATH_ENABLED = os.environ.get("BRAILLE_FAST_PATH", "0") == "1"
+WORDLIST_PATH = os.environ.get("BRAILLE_WORDLIST", "")
+SYSTEM_WORDLIST = "/usr/share/dict/words"
+WORDFREQ_TOP_N = 50000
+
+# Above this share of locally corrected words the decode is too noisy to trust
+MAX_CORRECTED_RATIO = 0.34
+
+WORD_RE = re.compile(r"[a-z]+")
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a, b):
+    """True if a and b differ by at most one insert, delete, substitution or adjacent swap."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def load_words():
+    """
+    Returns {word: frequency}. Sources, first match wins: BRAILLE_WORDLIST
+    ("word" or "word count" per line), the optional wordfreq package, the system word list.
+    """
+    path = WORDLIST_PATH
+    if path and os.path.exists(path):
+        words = {}
+        with open(path, encoding="utf-8") as f:
+            for rank, line in enumerate(f):
+                parts = line.split()
+                if not parts or not parts[0].isalpha():
+                    continue
+                freq = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else -rank
+                words.setdefault(parts[0].lower(), freq)
+        return words
+
+    try:
+        from wordfreq import top_n_list
+        ranked = top_n_list("en", WORDFREQ_TOP_N)
+        return {w: WORDFREQ_TOP_N - rank for rank, w in enumerate(ranked) if w.isalpha()}
+    except ImportError:
+        pass
+
+    if os.path.exists(SYSTEM_WORDLIST):
+        with open(SYSTEM_WORDLIST, encoding="utf-8", errors="ignore") as f:
+            return {w.strip().lower(): 1 for w in f if w.strip().isalpha()}
+    return {}
+
+
+class SymSpellIndex:
+    """
+    Symmetric-delete spelling index for edit distance 1: every dictionary word is
+    stored under each of its single-character deletes, so a lookup only needs the
+    deletes of the query instead of generating every possible edit.
+    """
+
+    def __init__(self, words):
+        self.words = words
+        self.deletes = {}
+        for word in words:
+            for d in _deletes(word):
+                self.deletes.setdefault(d, []).append(word)
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def correct(self, word):
+        """Most frequent dictionary word within one edit of `word`, or None."""
+        if word in self.words:
+            return word
+        candidates = set(self.deletes.get(word, ()))
+        for d in _deletes(word):
+            if d in self.words:
+                candidates.add(d)
+            candidates.update(self.deletes.get(d, ()))
+        candidates = [c for c in candidates if _within_one_edit(word, c)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda c: (self.words[c], c))
+
+
+class FastPath:
+    """
+    Cheap confidence stage in front of the T5 refiner. Text with no unknown cells
+    whose words are all in the dictionary (or one edit away) is returned directly.
+    Disabled (everything goes to the refiner) unless `enabled` / BRAILLE_FAST_PATH=1.
+    """
+
+    def __init__(self, enabled=FAST_PATH_ENABLED):
+        self.enabled = enabled
+        self.index = None
+        self.ready = threading.Event()
+
+    def load(self):
+        if self.ready.is_set():
+            return
+        if not self.enabled:
+            print("[*] Spelling fast path off (BRAILLE_FAST_PATH=1 enables it); every decode goes to the AI refiner.")
+            self.ready.set()
+            return
+        t0 = time.perf_counter()
+        words = load_words()
+        if words:
+            self.index = SymSpellIndex(words)
+            print(f"[+] Spelling index built: {len(words)} words in {time.perf_counter() - t0:.2f}s")
+        else:
+            print("[-] No word list found; every decode goes to the AI refiner.")
+        self.ready.set()
+
+    def check(self, text):
+        """
+        Returns (text, path): path is "clean" or "local" when the text can skip the
+        refiner, or (None, "model") when it needs the transformer.
+        """
+        if self.index is None or not text or "?" in text:
+            return None, "model"
+
+        words = WORD_RE.findall(text.lower())
+        if not words:
+            return text, "clean"
+
+        fixes = {}
+        for word in set(words):
+            if word in self.index:
+                continue
+            fixed = self.index.correct(word)
+            if fixed is None:
+                return None, "model"
+            fixes[word] = fixed
+
+        if not fixes:
+            return text, "clean"
+        if sum(w in fixes for w in words) > MAX_CORRECTED_RATIO * len(words):
+            return None, "model"
+        return WORD_RE.sub(lambda m: fixes.get(m.group(0), m.group(0)), text), "local"
@@ -0,0 +1,268 @@
+# braile/backend/src/tiling.py
+#
+# Tiled preprocessing for very large scans (600 dpi pages, stitched multi-page images):
+# the page is cut into overlapping horizontal strips that are cleaned and searched for
+# dots on all cores, so only a few strip-sized buffers exist at any time.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from preprocess import clean_image, CLAHE_CLIP_LIMIT, CLAHE_GRID
+from detector import dot_candidates, select_dots
+
+TILED_PREPROCESS = os.environ.get("BRAILLE_TILED", "1") != "0"
+TILE_MIN_MEGAPIXELS = float(os.environ.get("BRAILLE_TILE_MIN_MP", 16))
+TILE_HEIGHT = int(os.environ.get("BRAILLE_TILE_HEIGHT", 1024))
+# Must cover the filters' reach (41 px adaptive block, blur, dilations) plus half of the
+# tallest blob detect_dots() accepts (area < 15000 at aspect > 0.3, ~220 px)
+TILE_OVERLAP = int(os.environ.get("BRAILLE_TILE_OVERLAP", 128))
+TILE_WORKERS = int(os.environ.get("BRAILLE_TILE_WORKERS", os.cpu_count() or 1))
+
+# OpenCV releases the GIL, so strips run in parallel on plain threads without copying them
+_tile_pool = None
+
+def get_tile_pool():
+    global _tile_pool
+    if _tile_pool is None:
+        _tile_pool = ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix="tile-worker")
+    return _tile_pool
+
+def use_tiles(img):
+    h, w = img.shape[:2]
+    return TILED_PREPROCESS and h * w >= TILE_MIN_MEGAPIXELS * 1e6 and h > 2 * TILE_HEIGHT
+
+def otsu_threshold(hist):
+    """cv2's THRESH_OTSU threshold, computed from a 256-bin gray histogram."""
+    hist = np.asarray(hist, dtype=np.float64).ravel()
+    scale = 1.0 / hist.sum()
+    mu = float(np.dot(np.arange(256), hist)) * scale
+    mu1 = q1 = 0.0
+    max_sigma = max_val = 0.0
+    eps = np.finfo(np.float32).eps
+    for i in range(256):
+        p_i = hist[i] * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < eps or max(q1, q2) > 1.0 - eps:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) * (mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            max_val = i
+    return max_val
+
+# --- Page-wide CLAHE, strip by strip ------------------------------------------------------
+# Same arithmetic as cv2.createCLAHE(CLAHE_CLIP_LIMIT, CLAHE_GRID).apply(): tile histograms
+# are summed over the strips, then every strip interpolates between the page's tile LUTs.
+
+def clahe_geometry(H, W):
+    """Tile size and the bottom/right reflect padding cv2 adds when the grid doesn't divide the image."""
+    tiles_x, tiles_y = CLAHE_GRID
+    if W % tiles_x == 0 and H % tiles_y == 0:
+        pad_x = pad_y = 0
+    else:
+        pad_x, pad_y = tiles_x - W % tiles_x, tiles_y - H % tiles_y
+    return (W + pad_x) // tiles_x, (H + pad_y) // tiles_y, pad_x, pad_y
+
+def clahe_tile_histograms(gray, top, H, W):
+    """Per-tile histograms (tiles_y, tiles_x, 256) of page rows [top, top + len(gray))."""
+    tiles_x, tiles_y = CLAHE_GRID
+    tile_w, tile_h, pad_x, _ = clahe_geometry(H, W)
+    if pad_x:
+        gray = cv2.copyMakeBorder(gray, 0, 0, 0, pad_x, cv2.BORDER_REFLECT_101)
+    hists = np.zeros((tiles_y, tiles_x, 256), np.int64)
+    rows = np.arange(top, top + gray.shape[0]) // tile_h
+    for t in np.unique(rows):
+        band = gray[rows == t]
+        for c in range(tiles_x):
+            hists[t, c] += np.bincount(band[:, c * tile_w:(c + 1) * tile_w].ravel(), minlength=256)
+    return hists
+
+def clahe_luts(hists, H, W):
+    """Clipped, equalized LUT per tile from the page's tile histograms."""
+    tile_w, tile_h, _, _ = clahe_geometry(H, W)
+    total = tile_w * tile_h
+    limit = max(int(CLAHE_CLIP_LIMIT * total / 256), 1)
+    lut_scale = np.float32(255) / np.float32(total)
+    luts = np.empty(hists.shape, np.uint8)
+    for idx in np.ndindex(hists.shape[:2]):
+        hist = hists[idx].copy()
+        # 1. Clip and spread the excess evenly, the remainder one count per step
+        clipped = int(np.maximum(hist - limit, 0).sum())
+        hist = np.minimum(hist, limit) + clipped // 256
+        residual = clipped % 256
+        if residual:
+            step = max(256 // residual, 1)
+            for i in range(0, 256, step):
+                if residual <= 0:
+                    break
+                hist[i] += 1
+                residual -= 1
+        # 2. Equalize
+        cum = np.cumsum(hist).astype(np.float32)
+        luts[idx] = np.clip(np.rint(cum * lut_scale), 0, 255).astype(np.uint8)
+    return luts
+
+def apply_clahe(gray, top, luts, H, W):
+    """Bilinear blend of the four nearest tile LUTs for page rows [top, top + len(gray))."""
+    tiles_x, tiles_y = CLAHE_GRID
+    tile_w, tile_h, _, _ = clahe_geometry(H, W)
+
+    # 1. Neighbouring tiles and weights per row and per column (float32, as cv2 does)
+    def axis(coords, size, tiles):
+        f = coords.astype(np.float32) * (np.float32(1.0) / np.float32(size)) - np.float32(0.5)
+        t1 = np.floor(f).astype(np.int64)
+        a = (f - t1).astype(np.float32)
+        return np.maximum(t1, 0), np.minimum(t1 + 1, tiles - 1), a, np.float32(1.0) - a
+
+    ty1, ty2, ya, ya1 = axis(np.arange(top, top + gray.shape[0]), tile_h, tiles_y)
+    tx1, tx2, xa, xa1 = axis(np.arange(W), tile_w, tiles_x)
+
+    # 2. Blend block by block; inside a block the four LUTs are fixed, so cv2.LUT applies them
+    def blocks(t1, t2):
+        edges = np.flatnonzero(np.r_[True, (t1[1:] != t1[:-1]) | (t2[1:] != t2[:-1]), True])
+        return zip(edges[:-1], edges[1:])
+
+    out = np.empty_like(gray)
+    for r0, r1 in blocks(ty1, ty2):
+        for c0, c1 in blocks(tx1, tx2):
+            g = gray[r0:r1, c0:c1]
+            lut_tiles = [(ty1[r0], tx1[c0]), (ty1[r0], tx2[c0]), (ty2[r0], tx1[c0]), (ty2[r0], tx2[c0])]
+            A, B, C, D = (cv2.LUT(g, luts[t]).astype(np.float32) for t in lut_tiles)
+            A *= xa1[c0:c1]; B *= xa[c0:c1]; A += B; A *= ya1[r0:r1, None]
+            C *= xa1[c0:c1]; D *= xa[c0:c1]; C += D; C *= ya[r0:r1, None]
+            A += C
+            out[r0:r1, c0:c1] = np.rint(A, out=A)
+    return out
+
+# --- Tiled detection ----------------------------------------------------------------------
+
+def _page_stats(img, core, is_photo_mode):
+    """Pass-1 statistics of one core strip: gray histogram (digital) or CLAHE tile histograms (photo)."""
+    H, W = img.shape[:2]
+    gray = cv2.cvtColor(img[core[0]:core[1]], cv2.COLOR_BGR2GRAY)
+    if not is_photo_mode:
+        return np.bincount(gray.ravel(), minlength=256)
+    hists = clahe_tile_histograms(gray, core[0], H, W)
+    _, _, _, pad_y = clahe_geometry(H, W)
+    if pad_y and core[1] == H:
+        # cv2 pads the page bottom with reflected rows H-2, H-3, ...; they fall in the last tile row
+        tail = cv2.cvtColor(img[H - 1 - pad_y:H - 1][::-1], cv2.COLOR_BGR2GRAY)
+        hists += clahe_tile_histograms(tail, H, H, W)
+    return hists
+
+def _outer_background(thresh, candidates, lo, hi):
+    """
+    4-connected background labels of strip rows [lo, hi) (0 = foreground), plus the label of
+    the background just left of each candidate blob: at its leftmost column, in the row
+    nearest its centre. Blobs on the left page edge get -1: they border the outside.
+    """
+    _, labels = cv2.connectedComponents((thresh[lo:hi] == 0).view(np.uint8), connectivity=4, ltype=cv2.CV_32S)
+    outer = np.full(len(candidates), -1, np.int64)
+    _, x, y, _, h = candidates.astype(np.int64).T
+
+    # 1. Rows of every blob's leftmost column, blob after blob, where the blob meets background
+    start, stop = np.maximum(y, lo), np.minimum(y + h, hi)
+    counts = np.where(x > 0, np.maximum(stop - start, 0), 0)
+    blob = np.repeat(np.arange(len(candidates)), counts)
+    rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + start[blob]
+    edge = (thresh[rows, x[blob]] > 0) & (thresh[rows, x[blob] - 1] == 0)
+    blob, rows = blob[edge], rows[edge]
+
+    # 2. The row nearest each blob's centre
+    order = np.lexsort((np.abs(2 * rows - (2 * y + h)[blob]), blob))
+    blob, rows = blob[order], rows[order]
+    first = np.r_[True, blob[1:] != blob[:-1]] if len(blob) else np.zeros(0, bool)
+    outer[blob[first]] = labels[rows[first] - lo, x[blob[first]] - 1]
+    return labels, outer
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def detect_dots_tiled(img, is_photo_mode=True, method=None, tile_height=None, overlap=None):
+    """
+    clean_image() + detect_dots() strip by strip. Each strip owns the blobs whose centre lies
+    in its core rows, so blobs seen by two strips are counted once, and the dot-size filter
+    runs on all blobs together. The Otsu threshold and CLAHE tiles are computed page-wide.
+
+    A strip cut opens outlines (frames, borders) that enclose blobs on the whole page, where
+    findContours(RETR_EXTERNAL) never reports those blobs. So the background is labelled per
+    strip, the labels are joined across the strips' shared rows, and a blob is kept only if
+    the background around it reaches the page edge. The dots then match the whole-page path
+    as long as no blob passing the noise filter is taller than the overlap allows.
+    """
+    tile_height = tile_height or TILE_HEIGHT
+    overlap = TILE_OVERLAP if overlap is None else overlap
+    H, W = img.shape[:2]
+    cores = [(top, min(top + tile_height, H)) for top in range(0, H, tile_height)]
+    # Background is labelled on the core plus half the overlap, well clear of the cut edges
+    margin = overlap // 2
+    spans = [(max(core[0] - margin, 0), min(core[1] + margin, H)) for core in cores]
+    pool = get_tile_pool()
+
+    # 1. Page-wide parameters from per-strip histograms: Otsu threshold or CLAHE LUTs
+    stats = sum(pool.map(lambda core: _page_stats(img, core, is_photo_mode), cores))
+    threshold = None if is_photo_mode else otsu_threshold(stats)
+    luts = clahe_luts(stats, H, W) if is_photo_mode else None
+
+    # 2. Clean, find blob candidates and label the background per strip (core plus overlap on both sides)
+    def run(k):
+        core, (lo, hi) = cores[k], spans[k]
+        top, bottom = max(core[0] - overlap, 0), min(core[1] + overlap, H)
+        equalize = (lambda gray: apply_clahe(gray, top, luts, H, W)) if is_photo_mode else None
+        thresh = clean_image(img[top:bottom], is_photo_mode, threshold, equalize)
+        candidates = dot_candidates(thresh, method)
+        # Blobs touching a cut edge are incomplete here; the neighbouring strip sees them whole
+        y, h = candidates[:, 2], candidates[:, 4]
+        cut = ((y <= 0) & (top > 0)) | ((y + h >= bottom - top) & (bottom < H))
+        cy = candidates[:, 2] + top + h / 2.0
+        candidates = candidates[~cut & (core[0] <= cy) & (cy < core[1])]
+        labels, outer = _outer_background(thresh, candidates, lo - top, hi - top)
+        candidates[:, 2] += top
+        return candidates, labels, outer
+
+    strips = list(pool.map(run, range(len(cores))))
+
+    # 3. Join the strips' background labels: one set per page region, found through the shared rows
+    offsets = np.cumsum([0] + [int(labels.max()) + 1 for _, labels, _ in strips])
+    parent = np.arange(offsets[-1])
+    for k in range(len(strips) - 1):
+        (lo, hi), (next_lo, _) = spans[k], spans[k + 1]
+        upper, lower = strips[k][1], strips[k + 1][1]
+        if next_lo < hi:
+            a, b = upper[next_lo - lo:], lower[:hi - next_lo]
+        else:
+            # No shared rows (overlap < 2): join through the vertical neighbours at the seam
+            a, b = upper[-1:], lower[:1]
+        both = (a > 0) & (b > 0)
+        pairs = np.unique((a[both] + offsets[k]) * offsets[-1] + b[both] + offsets[k + 1])
+        for i, j in zip(*np.divmod(pairs, offsets[-1])):
+            ri, rj = _find(parent, i), _find(parent, j)
+            if ri != rj:
+                parent[ri] = rj
+
+    # Background on the page edge surrounds the page (findContours pads it with background)
+    edge = set()
+    for k, (_, labels, _) in enumerate(strips):
+        rim = [labels[:, 0], labels[:, -1]]
+        if spans[k][0] == 0:
+            rim.append(labels[0])
+        if spans[k][1] == H:
+            rim.append(labels[-1])
+        edge.update(_find(parent, i + offsets[k]) for i in np.unique(np.concatenate(rim)) if i > 0)
+
+    # 4. Keep the blobs outside every outline, then apply the 98th-percentile dot-size filter on the whole page
+    kept = []
+    for k, (candidates, _, outer) in enumerate(strips):
+        outside = [i < 0 or _find(parent, i + offsets[k]) in edge for i in outer]
+        kept.append(candidates[np.asarray(outside, dtype=bool)])
+    return select_dots(np.concatenate(kept))
@@ -0,0 +1,183 @@
+# braile/backend/src/translation_backends.py
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Which engine translates the refined English: "local" (a seq2seq model per language pair,
+# no network) or "googletrans" (the web API). Local pairs that fail to load use googletrans.
+TRANSLATION_BACKEND = os.environ.get("BRAILLE_TRANSLATION_BACKEND", "local").lower()
+# Hugging Face model per target language code; BRAILLE_TRANSLATION_MODEL_<CODE> overrides one pair
+TRANSLATION_MODEL = os.environ.get("BRAILLE_TRANSLATION_MODEL", "Helsinki-NLP/opus-mt-en-{lang}")
+# Language-pair models kept loaded at once (least recently used ones are dropped)
+TRANSLATION_MAX_MODELS = int(os.environ.get("BRAILLE_TRANSLATION_MAX_MODELS", 3))
+TRANSLATION_MAX_LENGTH = 512
+# A pair whose model failed to load is retried after this many seconds, doubling up to an hour
+TRANSLATION_RETRY_SECONDS = float(os.environ.get("BRAILLE_TRANSLATION_RETRY_SECONDS", 60))
+TRANSLATION_MAX_RETRY_SECONDS = 3600
+
+# Mapping for googletrans and the local model names
+LANG_MAP = {
+    "hindi": "hi", "tamil": "ta", "telugu": "te", "malayalam": "ml",
+    "marathi": "mr", "bengali": "bn", "kannada": "kn", "gujarati": "gu",
+    "punjabi": "pa", "french": "fr", "spanish": "es", "german": "de", "arabic": "ar"
+}
+
+
+def lang_code(target_lang):
+    """Language code for a target name ("hindi" -> "hi"); unknown names pass through."""
+    lang_input = target_lang.lower().strip()
+    if lang_input == "english":
+        return "en"
+    return LANG_MAP.get(lang_input, lang_input)
+
+
+def _resolve(result):
+    """
+    Newer googletrans releases return coroutines. Run them on a private event loop; in a
+    thread that already runs one (e.g. a Gradio callback) asyncio.run() would fail.
+    """
+    if not asyncio.iscoroutine(result):
+        return result
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(result)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, result).result()
+
+
+class GoogleTranslateBackend:
+    """googletrans web API; one request per batch (it accepts a list of texts)."""
+    name = "googletrans"
+
+    def __init__(self):
+        self.engine = None
+
+    def load(self):
+        from googletrans import Translator
+        self.engine = Translator()
+        return self
+
+    def cache_name(self, code):
+        """What translates `code` (part of translation cache keys)."""
+        return self.name
+
+    def translate_batch(self, texts, code):
+        results = _resolve(self.engine.translate(list(texts), dest=code))
+        return [r.text for r in results]
+
+
+class LocalTranslationBackend:
+    """
+    One local seq2seq model per language pair (MarianMT by default), loaded on first use
+    and kept in an LRU of at most `max_models` pairs. Pairs without a model fall back to
+    `fallback` (googletrans) if one is given, else translate_batch raises. A pair that
+    failed to load is retried with exponential backoff; pairs load under their own lock,
+    so a download never blocks the other languages.
+    """
+    name = "local"
+
+    def __init__(self, device=-1, max_models=TRANSLATION_MAX_MODELS, fallback=None):
+        self.device = device
+        self.max_models = max(1, max_models)
+        self.fallback = fallback
+        self.models = OrderedDict()
+        self.failed = {}  # code -> (retry at, backoff seconds)
+        self.pair_locks = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        import transformers  # noqa: F401 (fail early if the ML stack is missing)
+        return self
+
+    def model_name(self, code):
+        return os.environ.get(f"BRAILLE_TRANSLATION_MODEL_{code.upper()}", TRANSLATION_MODEL.format(lang=code))
+
+    def cache_name(self, code):
+        """
+        What translates `code` right now (part of translation cache keys): the pair's model,
+        or the fallback while a failed pair is backing off.
+        """
+        with self.lock:
+            backing_off = code not in self.models and time.monotonic() < self.failed.get(code, (0, 0))[0]
+        if backing_off:
+            return self.fallback.cache_name(code) if self.fallback is not None else None
+        return f"{self.name}:{self.model_name(code)}"
+
+    def _cached_model(self, code):
+        with self.lock:
+            if code in self.models:
+                self.models.move_to_end(code)
+                return self.models[code]
+            return None
+
+    def _get_model(self, code):
+        model = self._cached_model(code)
+        if model is not None:
+            return model
+        with self.lock:
+            pair_lock = self.pair_locks.setdefault(code, threading.Lock())
+        with pair_lock:
+            # Loaded by another thread meanwhile, or still backing off after a failure
+            model = self._cached_model(code)
+            if model is not None:
+                return model
+            retry_at, backoff = self.failed.get(code, (0, 0))
+            if time.monotonic() < retry_at:
+                return None
+            from transformers import pipeline
+            name = self.model_name(code)
+            try:
+                print(f"[*] Loading translation model {name}...")
+                model = pipeline("translation", model=name, device=self.device)
+            except Exception as e:
+                backoff = min(backoff * 2 or TRANSLATION_RETRY_SECONDS, TRANSLATION_MAX_RETRY_SECONDS)
+                print(f"[-] Translation model {name} unavailable ({e}); retrying in {backoff:.0f}s")
+                self.failed[code] = (time.monotonic() + backoff, backoff)
+                return None
+            self.failed.pop(code, None)
+            with self.lock:
+                self.models[code] = model
+                if len(self.models) > self.max_models:
+                    evicted, _ = self.models.popitem(last=False)
+                    print(f"[*] Unloaded translation model for '{evicted}'")
+            return model
+
+    def translate_batch(self, texts, code):
+        model = self._get_model(code)
+        if model is None:
+            if self.fallback is not None:
+                return self.fallback.translate_batch(texts, code)
+            raise RuntimeError(f"No translation model for '{code}'")
+        outputs = model(list(texts), batch_size=len(texts), max_length=TRANSLATION_MAX_LENGTH)
+        return [out["translation_text"] for out in outputs]
+
+    def loaded_pairs(self):
+        with self.lock:
+            return list(self.models)
+
+
+def build_translation_backend(device, backend=TRANSLATION_BACKEND):
+    """
+    Returns a loaded backend. "local" keeps googletrans (when installed) as the fallback for
+    pairs it cannot load; if neither can be set up, None (texts stay untranslated, uncached).
+    """
+    google = None
+    try:
+        google = GoogleTranslateBackend().load()
+    except Exception as e:
+        print(f"[-] googletrans unavailable: {e}")
+
+    if backend == "googletrans":
+        return google
+    if backend != "local":
+        print(f"[-] Unknown translation backend '{backend}'; using local.")
+    try:
+        return LocalTranslationBackend(device, fallback=google).load()
+    except Exception as e:
+        print(f"[-] Local translation unavailable ({e}); using googletrans.")
+        return google
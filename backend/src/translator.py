@@ -1,5 +1,35 @@
 # braile/backend/src/translator.py
 
+import re
+
+import numpy as np
+
+ENG_TO_BRAILLE = {
+    'a': '⠁', 'b': '⠃', 'c': '⠉', 'd': '⠙', 'e': '⠑',
+    'f': '⠋', 'g': '⠛', 'h': '⠓', 'i': '⠊', 'j': '⠚',
+    'k': '⠅', 'l': '⠇', 'm': '⠍', 'n': '⠝', 'o': '⠕',
+    'p': '⠏', 'q': '⠟', 'r': '⠗', 's': '⠎', 't': '⠞',
+    'u': '⠥', 'v': '⠧', 'w': '⠺', 'x': '⠭', 'y': '⠽',
+    'z': '⠵', ' ': '⠀', '\n': '\n',
+    ',': '⠂', ';': '⠆', ':': '⠒', '.': '⠲', '!': '⠖',
+    '?': '⠦', "'": '⠄', '-': '⠤', '#': '⠼'
+}
+BRAILLE_TO_ENG = {v: k for k, v in ENG_TO_BRAILLE.items()}
+
+# Cells read as digits while in number mode
+NUM_MAP = {
+    'a': '1', 'b': '2', 'c': '3', 'd': '4', 'e': '5',
+    'f': '6', 'g': '7', 'h': '8', 'i': '9', 'j': '0',
+    ',': '1', ';': '2', ':': '3', '.': '4', '_': '5',
+    '!': '6', '=': '7', '?': '8', '*': '9', '"': '0'
+}
+DIGIT_TO_LETTER = {'1':'a', '2':'b', '3':'c', '4':'d', '5':'e', '6':'f', '7':'g', '8':'h', '9':'i', '0':'j'}
+
+# '#' starts number mode; it lasts while the following characters are number cells
+NUMBER_RUN_RE = re.compile("#+([" + re.escape("".join(NUM_MAP)) + "]*)")
+# From the first digit of a space/newline-delimited run to the end of that run
+DIGIT_RUN_RE = re.compile(r"[0-9][^ \n]*")
+
 class BrailleTranslator:
     def __init__(self):
         self.braille_map = {
@@ -14,6 +44,18 @@ class BrailleTranslator:
             '011000': ';', '010010': ':', '010001': '_', '011011': '=',
             '001010': '*', '001011': '"'
         }
+        # 64-entry lookup table indexed by the 6-bit cell code (bit i = dot position i)
+        self.cell_lut = np.full(64, '?', dtype='<U1')
+        for code, char in self.braille_map.items():
+            self.cell_lut[int(code[::-1], 2)] = char
+
+        # str.translate tables, built once instead of per call
+        self.num_table = str.maketrans(NUM_MAP)
+        self.braille_table = str.maketrans(BRAILLE_TO_ENG)
+        self.text_table = str.maketrans({
+            **ENG_TO_BRAILLE,
+            **{d: ENG_TO_BRAILLE[l] for d, l in DIGIT_TO_LETTER.items()}
+        })
 
     def decode_cell(self, cluster, cell_anchor_x, S_x, S_y, line_top_cy):
         if not cluster: return "?", (0, 0, 0, 0)
@@ -36,70 +78,14 @@ class BrailleTranslator:
         return char, (box_x1, box_y1, box_x2, box_y2)
 
     def post_process_text(self, text):
-        num_map = {
-            'a': '1', 'b': '2', 'c': '3', 'd': '4', 'e': '5',
-            'f': '6', 'g': '7', 'h': '8', 'i': '9', 'j': '0',
-            ',': '1', ';': '2', ':': '3', '.': '4', '_': '5',
-            '!': '6', '=': '7', '?': '8', '*': '9', '"': '0'
-        }
-        result =[]
-        is_number_mode = False
-        for char in text:
-            if char == '#':
-                is_number_mode = True
-                continue
-            if char == ' ' or char == '\n':
-                is_number_mode = False
-                result.append(char)
-            elif is_number_mode:
-                if char in num_map:
-                    result.append(num_map[char])
-                else:
-                    is_number_mode = False
-                    result.append(char)
-            else:
-                result.append(char)
-        return "".join(result)
+        """Applies number mode: after '#', cells a-j (and their lower-cell twins) become digits."""
+        return NUMBER_RUN_RE.sub(lambda m: m.group(1).translate(self.num_table), text)
 
     def text_to_braille(self, text):
-        eng_to_braille = {
-            'a': '⠁', 'b': '⠃', 'c': '⠉', 'd': '⠙', 'e': '⠑',
-            'f': '⠋', 'g': '⠛', 'h': '⠓', 'i': '⠊', 'j': '⠚',
-            'k': '⠅', 'l': '⠇', 'm': '⠍', 'n': '⠝', 'o': '⠕',
-            'p': '⠏', 'q': '⠟', 'r': '⠗', 's': '⠎', 't': '⠞',
-            'u': '⠥', 'v': '⠧', 'w': '⠺', 'x': '⠭', 'y': '⠽',
-            'z': '⠵', ' ': '⠀', '\n': '\n',
-            ',': '⠂', ';': '⠆', ':': '⠒', '.': '⠲', '!': '⠖',
-            '?': '⠦', "'": '⠄', '-': '⠤', '#': '⠼'
-        }
-        num_map = {'1':'a', '2':'b', '3':'c', '4':'d', '5':'e', '6':'f', '7':'g', '8':'h', '9':'i', '0':'j'}
-        result = ""
-        is_number_mode = False
-        for char in text.lower():
-            if char.isdigit():
-                if not is_number_mode:
-                    result += eng_to_braille['#']
-                    is_number_mode = True
-                result += eng_to_braille[num_map[char]]
-            else:
-                if char == ' ' or char == '\n':
-                    is_number_mode = False
-                result += eng_to_braille.get(char, char)
-        return result
+        # A number sign goes before the first digit of every space/newline-delimited run
+        marked = DIGIT_RUN_RE.sub(r"#\g<0>", text.lower())
+        return marked.translate(self.text_table)
 
     def braille_to_text(self, braille_str):
         """Converts Unicode Braille Characters back into Raw English Text"""
-        braille_to_eng = {
-            '⠁': 'a', '⠃': 'b', '⠉': 'c', '⠙': 'd', '⠑': 'e',
-            '⠋': 'f', '⠛': 'g', '⠓': 'h', '⠊': 'i', '⠚': 'j',
-            '⠅': 'k', '⠇': 'l', '⠍': 'm', '⠝': 'n', '⠕': 'o',
-            '⠏': 'p', '⠟': 'q', '⠗': 'r', '⠎': 's', '⠞': 't',
-            '⠥': 'u', '⠧': 'v', '⠺': 'w', '⠭': 'x', '⠽': 'y',
-            '⠵': 'z', '⠀': ' ', '\n': '\n',
-            '⠂': ',', '⠆': ';', '⠒': ':', '⠲': '.', '⠖': '!',
-            '⠦': '?', '⠄': "'", '⠤': '-', '⠼': '#'
-        }
-        raw_text = ""
-        for char in braille_str:
-            raw_text += braille_to_eng.get(char, char)
-        return raw_text
\ No newline at end of file
+        return braille_str.translate(self.braille_table)
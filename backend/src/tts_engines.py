@@ -0,0 +1,103 @@
+# braile/backend/src/tts_engines.py
+
+import io
+import os
+import shutil
+import subprocess
+import threading
+
+# Which engine speaks the text: "gtts" (Google's web voices) or "espeak" (espeak-ng, offline).
+# If the chosen engine cannot be set up, the other one is used.
+TTS_ENGINE = os.environ.get("BRAILLE_TTS_ENGINE", "gtts").lower()
+# espeak-ng binary; by default the first of espeak-ng / espeak on PATH
+ESPEAK_BIN = os.environ.get("BRAILLE_ESPEAK_BIN", "")
+STREAM_CHUNK_BYTES = 16 * 1024
+
+AUDIO_MEDIA_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav"}
+
+
+class GTTSEngine:
+    """Google Translate's TTS voices (needs network). MP3 parts are yielded as they arrive."""
+    name = "gtts"
+    ext = "mp3"
+    media_type = AUDIO_MEDIA_TYPES[ext]
+
+    def __init__(self):
+        self.gTTS = None
+
+    def load(self):
+        from gtts import gTTS
+        self.gTTS = gTTS
+        return self
+
+    def stream(self, text, lang):
+        tts = self.gTTS(text=text, lang=lang)
+        if hasattr(tts, "stream"):
+            yield from tts.stream()
+            return
+        fp = io.BytesIO()
+        tts.write_to_fp(fp)
+        yield fp.getvalue()
+
+
+class EspeakEngine:
+    """espeak-ng in a subprocess: offline, WAV written to stdout and yielded chunk by chunk."""
+    name = "espeak"
+    ext = "wav"
+    media_type = AUDIO_MEDIA_TYPES[ext]
+
+    def __init__(self, binary=ESPEAK_BIN):
+        self.binary = binary
+
+    def load(self):
+        self.binary = self.binary or shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.binary:
+            raise RuntimeError("espeak-ng not found (install it or set BRAILLE_ESPEAK_BIN)")
+        return self
+
+    def stream(self, text, lang):
+        proc = subprocess.Popen(
+            [self.binary, "-v", lang, "--stdout", "--stdin"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        # Feed the text from a thread: long texts would otherwise deadlock on full pipes
+        threading.Thread(target=self._feed, args=(proc, text), daemon=True).start()
+        try:
+            while chunk := proc.stdout.read(STREAM_CHUNK_BYTES):
+                yield chunk
+            error = proc.stderr.read().decode("utf-8", "ignore").strip()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.stderr.close()
+            proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"espeak-ng failed for voice '{lang}': {error or proc.returncode}")
+
+    @staticmethod
+    def _feed(proc, text):
+        try:
+            proc.stdin.write(text.encode("utf-8"))
+            proc.stdin.close()
+        except OSError:
+            pass  # process exited early (e.g. unknown voice); stream() reports it
+
+
+ENGINES = {"gtts": GTTSEngine, "espeak": EspeakEngine}
+
+
+def build_tts_engine(engine=TTS_ENGINE):
+    """Returns a loaded engine, falling back to the other one; None if neither can be set up."""
+    if engine not in ENGINES:
+        print(f"[-] Unknown TTS engine '{engine}'; using gtts.")
+        engine = "gtts"
+    for name in [engine] + [n for n in ENGINES if n != engine]:
+        try:
+            tts = ENGINES[name]().load()
+        except Exception as e:
+            print(f"[-] TTS engine '{name}' unavailable: {e}")
+            continue
+        print(f"[+] TTS engine: {name}")
+        return tts
+    return None
@@ -0,0 +1,42 @@
+# braile/backend/tests/test_tiling.py
+#
+# Run from backend/: python -m pytest tests
+
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from preprocess import clean_image
+from detector import detect_dots
+from tiling import detect_dots_tiled
+
+
+def framed_page():
+    """A page of dot cells, with a frame around most of them and a small frame around one cell."""
+    rng = np.random.default_rng(0)
+    page = np.full((4200, 3000, 3), 255, np.uint8)
+    for top in range(60, 4140, 60):
+        for left in range(40, 2960, 40):
+            for dy, dx in ((0, 0), (12, 0), (24, 0), (0, 12), (12, 12), (24, 12)):
+                if rng.random() < 0.5:
+                    cv2.circle(page, (left + dx, top + dy), 4, (0, 0, 0), -1)
+    # The big frame crosses every strip cut; the small one crosses the first cut only
+    cv2.rectangle(page, (20, 150), (2980, 4050), (0, 0, 0), 6)
+    cv2.rectangle(page, (1000, 980), (1100, 1070), (0, 0, 0), 3)
+    return page
+
+
+@pytest.mark.parametrize("is_photo_mode", [False, True])
+@pytest.mark.parametrize("method", ["contours", "cc"])
+@pytest.mark.parametrize("tile_height", [800, 1024, 1500])
+def test_tiled_matches_whole_page_with_frame(is_photo_mode, method, tile_height):
+    page = framed_page()
+    whole = np.asarray(detect_dots(clean_image(page, is_photo_mode), method), dtype=np.float64).reshape(-1, 6)
+    tiled = detect_dots_tiled(page, is_photo_mode, method, tile_height=tile_height)
+    assert len(whole) > 0
+    assert sorted(map(tuple, tiled.tolist())) == sorted(map(tuple, whole.tolist()))
@@ -263,7 +263,7 @@ function App() {
               <div className={`p-5 rounded-[2.5rem] border ${isDark ? "bg-white/5 border-white/10" : "bg-white/80 border-white"}`}>
                 <span className="text-[11px] uppercase font-black tracking-widest block mb-4 text-amber-600">AI Computer Vision Map</span>
                 <div className={`rounded-[1.5rem] overflow-hidden min-h-[320px] flex items-center justify-center border ${isDark ? "bg-slate-950 border-white/5" : "bg-white border-amber-100 shadow-inner"}`}>
-                    {result?.image ? <img src={result.image} alt="AI output" className="w-full h-auto" /> : <ImageIcon size={64} className="opacity-20" />}
+                    {result?.image || result?.image_url ? <img src={result.image || result.image_url} alt="AI output" className="w-full h-auto" /> : <ImageIcon size={64} className="opacity-20" />}
                 </div>
               </div>
               <div className="space-y-4">